@@ -0,0 +1,7 @@
+#!/bin/bash
+# Note: Update the project directory path in the following docker run command.
+# Parses all .txt files in this directory with a single container (and a single
+# parser instance) and writes one .parse file per review into ../results.
+docker run -v PROJECT_ABSOLUTE_PATH/AspectHierarchy/feng-hirst-rst-parser/preprocessed_texts:/RANDOM_DIR_NAME \
+    -v PROJECT_ABSOLUTE_PATH/AspectHierarchy/feng-hirst-rst-parser/results:/RANDOM_RESULTS_DIR_NAME \
+    feng-hirst /RANDOM_DIR_NAME /RANDOM_RESULTS_DIR_NAME
@@ -0,0 +1,149 @@
+#!/usr/bin/env python2.7
+
+"""
+Compares the greedy and the shift-reduce decoding of the document-level
+discourse tree on the given input files, e.g.
+
+    python benchmark_decoding.py ../texts/*.txt
+
+Each file is preprocessed and segmented only once. For each decoding, its
+sentences are parsed anew, since greedy decoding relabels the stumps it
+merges, including the roots of the sentence-level trees, and then the
+document-level tree is built with empty CRF result caches. For each file and
+in total, the seconds and the number of CRF sequences each decoding takes
+(for the document-level tree only) are printed, and how much of the
+shift-reduce tree agrees with the greedy one, i.e. the share of its spans,
+spans with nuclearity, and spans with relation (RST-Parseval) that are also
+in the greedy tree. Both trees are binary trees of the same EDUs, so
+precision, recall and F1 are the same. This is the agreement with greedy
+decoding, not the accuracy of either decoding, which takes gold trees.
+
+The usual parser options apply, e.g. -b for the CRF backend.
+"""
+
+import os
+import sys
+import time
+
+from document.doc import Document
+from parse import DiscourseParser, parse_args
+from parsers.base_parser import TreeBuildingBudget
+from trees.parse_tree import ParseTree
+
+
+def get_spans(tree, start=0, spans=None):
+    """
+    Returns the (start, end, nuclearity, relation) tuple of each subtree of
+    the tree, whose labels are of the form Relation[N][S].
+    """
+    if spans is None:
+        spans = []
+    if not isinstance(tree, ParseTree):
+        return spans
+
+    label = tree.label()
+    if '[' in label:
+        relation = label[:label.index('[')]
+        nuclearity = label[label.index('['):]
+    else:
+        relation = label
+        nuclearity = ''
+
+    end = start + len(tree.leaves())
+    spans.append((start, end, nuclearity, relation))
+
+    left = tree[0]
+    get_spans(left, start, spans)
+    get_spans(tree[1], start + (len(left.leaves()) if isinstance(left, ParseTree) else 1), spans)
+    return spans
+
+
+def get_agreement(tree, reference):
+    """
+    Returns the numbers of spans of tree that are in reference, without
+    labels, with nuclearity and with relation, and the number of spans.
+    """
+    spans = get_spans(tree)
+    reference_spans = get_spans(reference)
+
+    agreement = []
+    for key in (lambda span: span[:2], lambda span: span[:3], lambda span: span[:2] + span[3:]):
+        reference_keys = set(key(span) for span in reference_spans)
+        agreement.append(sum(1 for span in spans if key(span) in reference_keys))
+
+    return agreement + [len(spans)]
+
+
+def build_document_tree(treebuilder, doc, decoding):
+    """
+    Returns the discourse tree of doc built with the given decoding from
+    newly parsed sentences, and the seconds and the number of CRF sequences
+    the document-level tree took.
+    """
+    for sentence in doc.sentences:
+        treebuilder.intra_parser.parse_each_sentence(sentence)
+
+    multi_parser = treebuilder.multi_parser
+    for classifier in (multi_parser.bin_classifier, multi_parser.mc_classifier):
+        classifier.cache.clear()
+
+    # a budget without bounds just counts the CRF sequences
+    multi_parser.budget = TreeBuildingBudget()
+    start = time.time()
+    try:
+        multi_parser.parse_document(doc, shift_reduce=decoding == 'shift-reduce')
+    finally:
+        seconds = time.time() - start
+        crf_calls = multi_parser.budget.crf_calls
+        multi_parser.budget = None
+
+    return doc.discourse_tree, seconds, crf_calls
+
+
+def main():
+    options, args = parse_args()
+
+    # keep the parser's own output out of the results
+    results_stdout = sys.stdout
+    sys.stdout = sys.stderr if options.verbose else open(os.devnull, 'w')
+
+    parser = DiscourseParser(options=options)
+    totals = {'greedy': [0.0, 0], 'shift-reduce': [0.0, 0]}
+    total_agreement = [0, 0, 0, 0]
+    try:
+        results_stdout.write('file\tedus\tgreedy_s\tgreedy_crf\tshift_reduce_s\tshift_reduce_crf\t'
+                             'span_agreement\tnuclearity_agreement\trelation_agreement\n')
+        for filename in args:
+            doc = Document()
+            doc.preprocess(filename, parser.preprocesser)
+            parser.segmenter.segment(doc)
+            if len(doc.edus) == 1:
+                continue
+
+            row = [os.path.basename(filename), str(len(doc.edus))]
+            trees = {}
+            for decoding in ('greedy', 'shift-reduce'):
+                trees[decoding], seconds, crf_calls = build_document_tree(parser.treebuilder, doc, decoding)
+                totals[decoding][0] += seconds
+                totals[decoding][1] += crf_calls
+                row.extend(['%.3f' % seconds, str(crf_calls)])
+
+            agreement = get_agreement(trees['shift-reduce'], trees['greedy'])
+            total_agreement = [a + b for (a, b) in zip(total_agreement, agreement)]
+            row.extend(['%.3f' % (float(a) / agreement[-1]) for a in agreement[:-1]])
+            results_stdout.write('\t'.join(row) + '\n')
+            results_stdout.flush()
+    finally:
+        parser.unload()
+        sys.stdout = results_stdout
+
+    if total_agreement[-1]:
+        row = ['total', '']
+        for decoding in ('greedy', 'shift-reduce'):
+            row.extend(['%.3f' % totals[decoding][0], str(totals[decoding][1])])
+        row.extend(['%.3f' % (float(a) / total_agreement[-1]) for a in total_agreement[:-1]])
+        sys.stdout.write('\t'.join(row) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,398 @@
 import subprocess
 import paths
 import os.path
+import re
+import threading
+import multiprocessing
+import hashlib
+from collections import OrderedDict
+
+try:
+    # the SWIG binding in tools/crfsuite/crfsuite-0.12/swig/python
+    import crfsuite
+except ImportError:
+    crfsuite = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from classifiers.crf_model import CRFModel, read_attributes
+
+BACKENDS = ['swig', 'numpy', 'subprocess']
+if crfsuite is not None:
+    DEFAULT_BACKEND = 'swig'
+elif numpy is not None:
+    DEFAULT_BACKEND = 'numpy'
+else:
+    DEFAULT_BACKEND = 'subprocess'
+
+# maximum number of resolved feature strings kept by each CRFClassifier, and
+# of attributes kept by each SWIGTagger
+ATTRIBUTE_CACHE_SIZE = 200000
+
+# maximum number of classified sequences kept by each CRFClassifier
+RESULT_CACHE_SIZE = 50000
+
+# the prefix of an attribute value that atof() converts to a number
+ATOF_RE = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+
+
+def split_attribute(field):
+    """
+    Splits an attribute field into its name and weight, the way crfsuite's
+    IWA reader does: the name ends at the first unescaped colon, the weight
+    is the numeric prefix of what follows (1.0 if there is nothing) and
+    anything after a second colon is ignored.
+    """
+    if '\\' in field:
+        parts = ['']
+        i = 0
+        while i < len(field):
+            c = field[i]
+            if c == '\\' and i + 1 < len(field) and field[i + 1] in ':\\':
+                i += 1
+                c = field[i]
+            elif c == ':':
+                if len(parts) == 2:
+                    break
+                parts.append('')
+                i += 1
+                continue
+            parts[-1] += c
+            i += 1
+    else:
+        parts = field.split(':', 2)[ : 2]
+
+    if len(parts) == 1 or parts[1] == '':
+        return parts[0], 1.0
+
+    match = ATOF_RE.match(parts[1])
+    return parts[0], float(match.group()) if match else 0.0
+
+
+class SubprocessTagger:
+    """Tags sequences with a long-lived crfsuite-stdin process."""
+    def __init__(self, model_fname):
+        self.classifier_cmd = '%s/crfsuite-stdin tag -pi -m %s -' % (paths.CRFSUITE_PATH, model_fname)
+#        print self.classifier_cmd
+        self.classifier = subprocess.Popen(self.classifier_cmd, shell = True, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+
+        if self.classifier.poll():
+            raise OSError('Could not create classifier subprocess, with error info:\n%s' % self.classifier.stderr.readline())
+
+        self.attribute_ids = read_attributes(model_fname)
+
+        # sequences are written and their results read back under this lock
+        self.lock = threading.Lock()
+
+    def share(self):
+        # the processes forked from now on take turns with the tagger
+        self.lock = multiprocessing.Lock()
+
+    def compile(self, fields, attributes):
+        # crfsuite-stdin reads the items as text
+        return '\t'.join(['0'] + fields) + '\n'
+
+    def tag(self, items):
+        with self.lock:
+            self.write_sequences([items])
+            return self.read_result()
+
+    def tag_many(self, sequences):
+        if len(sequences) == 1:
+            return [self.tag(sequences[0])]
+
+        with self.lock:
+            # write from another thread, otherwise the tagger could block on
+            # its full output pipe while we still block on writing its input
+            writer = threading.Thread(target = self.write_sequences, args = (sequences,))
+            writer.start()
+            try:
+                results = [self.read_result() for items in sequences]
+            finally:
+                writer.join()
+
+        return results
+
+    def write_sequences(self, sequences):
+        # the tagger process stays alive: each sequence is terminated by an
+        # empty line and answered by exactly one result block, i.e. the
+        # sequence probability, one line per item and an empty line
+        data = []
+        for items in sequences:
+            data.extend(items)
+            data.append('\n')
+
+        try:
+            self.classifier.stdin.write(''.join(data))
+            self.classifier.stdin.flush()
+        except IOError:
+            # the tagger died; read_result reports it
+            pass
+
+    def read_result(self):
+        lines = []
+        while True:
+            line = self.classifier.stdout.readline()
+            if line == '':
+                raise OSError('crf_classifier subprocess died, with error info:\n%s' % self.classifier.stderr.read())
+
+            if line.strip() == '':
+                break
+            lines.append(line)
+
+        predictions = []
+        for line in lines[1 : ]:
+            fields = line.strip().split(':')
+            label = fields[0]
+            prob = float(fields[1])
+            predictions.append((label, prob))
+
+        seq_prob = float(lines[0].split('\t')[1])
+
+        return seq_prob, predictions
+
+    def poll(self):
+        return self.classifier.poll() != None
+
+    def unload(self):
+        self.classifier.stdin.close()
+        self.classifier.wait()
+
+
+class SWIGTagger:
+    """Tags sequences in-process with the crfsuite SWIG binding."""
+    def __init__(self, model_fname):
+        if crfsuite is None:
+            raise OSError('The crfsuite SWIG binding is not installed')
+
+        self.tagger = crfsuite.Tagger()
+        if not self.tagger.open(model_fname):
+            raise OSError('Could not open CRF model %s' % model_fname)
+
+        self.attribute_ids = read_attributes(model_fname)
+        self.closed = False
+        # creating a crfsuite.Attribute is much slower than looking it up,
+        # and the same feature strings come up over and over again
+        self.attributes = {}
+
+    def get_attribute(self, field, name, value):
+        if len(self.attributes) >= ATTRIBUTE_CACHE_SIZE:
+            self.attributes = {}
+
+        attribute = crfsuite.Attribute(name, value)
+        self.attributes[field] = attribute
+        return attribute
+
+    def compile(self, fields, attributes):
+        # the binding takes attribute names, which crfsuite resolves again
+        cached = self.attributes
+        return crfsuite.Item([cached[field] if field in cached else self.get_attribute(field, name, value)
+                              for (field, (name, aid, value)) in zip(fields, attributes)])
+
+    def tag(self, items):
+        xseq = crfsuite.ItemSequence()
+        for item in items:
+            xseq.append(item)
+
+        self.tagger.set(xseq)
+        yseq = self.tagger.viterbi()
+
+        # round like 'crfsuite tag' does, so that all backends make the
+        # same decisions
+        seq_prob = float('%f' % self.tagger.probability(yseq))
+        predictions = []
+        for (t, y) in enumerate(yseq):
+            predictions.append((y, float('%f' % self.tagger.marginal(y, t))))
+
+        return seq_prob, predictions
+
+    def tag_many(self, sequences):
+        return [self.tag(items) for items in sequences]
+
+    def share(self):
+        # the model is in this process's memory, which forked processes
+        # share copy-on-write
+        pass
+
+    def poll(self):
+        return self.closed
+
+    def unload(self):
+        self.tagger.close()
+        self.closed = True
+
+
+class NumPyTagger:
+    """Tags sequences in-process with a CRFModel, without crfsuite."""
+    def __init__(self, model_fname):
+        if numpy is None:
+            raise OSError('NumPy is not installed')
+
+        self.model = CRFModel(model_fname)
+        self.attribute_ids = self.model.attributes
+        self.closed = False
+
+    def compile(self, fields, attributes):
+        return (numpy.array([aid for (name, aid, value) in attributes], dtype = numpy.intp),
+                numpy.array([value for (name, aid, value) in attributes]))
+
+    def tag(self, items):
+        return self.tag_many([items])[0]
+
+    def tag_many(self, sequences):
+        # compute the state scores of all items of all sequences at once
+        items = [item for items in sequences for item in items]
+        counts = [len(aids) for (aids, values) in items]
+        state = self.model.state_scores(numpy.concatenate([aids for (aids, values) in items]),
+                                        numpy.concatenate([values for (aids, values) in items]),
+                                        numpy.repeat(numpy.arange(len(items)), counts), len(items))
+
+        # decode the sequences of each length together
+        offsets = numpy.cumsum([0] + [len(items) for items in sequences])
+        by_length = {}
+        for (i, items) in enumerate(sequences):
+            by_length.setdefault(len(items), []).append(i)
+
+        results = [None] * len(sequences)
+        for (T, indices) in by_length.iteritems():
+            rows = (offsets[indices][:, None] + numpy.arange(T)).ravel()
+            for (i, (seq_prob, predictions)) in zip(indices, self.model.tag(state[rows].reshape((len(indices), T, -1)))):
+                # round like 'crfsuite tag' does, so that all backends make
+                # the same decisions
+                results[i] = (float('%f' % seq_prob), [(label, float('%f' % prob)) for (label, prob) in predictions])
+
+        return results
+
+    def share(self):
+        # the model's arrays are only read, so forked processes share them
+        # copy-on-write
+        pass
+
+    def poll(self):
+        return self.closed
+
+    def unload(self):
+        self.model = None
+        self.closed = True
+
+
+class ResultCache:
+    """
+    A bounded LRU cache of classification results, keyed by the
+    fingerprints of the items of a sequence.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self.results.pop(key, None)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            # move it to the end, i.e. make it the most recently used
+            self.results[key] = result
+        return result
+
+    def put(self, key, result):
+        if self.size <= 0:
+            return
+
+        self.results.pop(key, None)
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last = False)
+
+    def clear(self):
+        self.results.clear()
+
 
 class CRFClassifier:
-    def __init__(self, name, model_type, model_path, model_file, verbose):
+    def __init__(self, name, model_type, model_path, model_file, verbose, backend = None, cache_size = RESULT_CACHE_SIZE):
         self.verbose = verbose
         self.name = name
         self.type = model_type
         self.model_fname = model_file
         self.model_path = model_path
-        
+        self.backend = backend if backend is not None else DEFAULT_BACKEND
+
         if not os.path.exists(os.path.join(self.model_path, self.model_fname)):
             print 'The model path %s for CRF classifier %s does not exist.' % (os.path.join(self.model_path, self.model_fname), name)
             raise OSError('Could not create classifier subprocess')
-        
-        
-        self.classifier_cmd = '%s/crfsuite-stdin tag -pi -m %s -' % (paths.CRFSUITE_PATH, 
-							 os.path.join(self.model_path, self.model_fname))
-#        print self.classifier_cmd
-        self.classifier = subprocess.Popen(self.classifier_cmd, shell = True, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-        
-        if self.classifier.poll():
-            raise OSError('Could not create classifier subprocess, with error info:\n%s' % self.classifier.stderr.readline())
-        
+
+        if self.backend == 'swig':
+            self.classifier = SWIGTagger(os.path.join(self.model_path, self.model_fname))
+        elif self.backend == 'numpy':
+            self.classifier = NumPyTagger(os.path.join(self.model_path, self.model_fname))
+        elif self.backend == 'subprocess':
+            self.classifier = SubprocessTagger(os.path.join(self.model_path, self.model_fname))
+        else:
+            raise ValueError('Unknown CRF backend %s' % self.backend)
+
+        # the same windows of constituents are classified over and over
+        # again while a tree is built, and a cache hit is much cheaper than
+        # tagging the sequence once more. Each classifier has its own model,
+        # so the cache is per classifier.
+        self.cache = ResultCache(cache_size)
+        # the number of sequences tagged by the backend, i.e. not found in
+        # the cache
+        self.tagged = 0
+
+        # the (name, attribute id, weight) of each feature string, or None
+        # if the model doesn't know the attribute
+        self.attributes = {}
+
         #self.cnt = 0
 
-    def classify(self, vectors):
+    def get_attribute(self, field):
+        if len(self.attributes) >= ATTRIBUTE_CACHE_SIZE:
+            self.attributes = {}
+
+        (name, value) = split_attribute(field)
+        aid = self.classifier.attribute_ids.get(name)
+        attribute = (name, aid, value) if aid is not None else None
+        self.attributes[field] = attribute
+        return attribute
+
+    def compile(self, fields):
+        """
+        Compiles the features of one item, e.g. ['Num_EDUs=1'], into the
+        backend's own representation for classify(). Each feature string
+        is resolved only once per model, to the id of its attribute in the
+        model's dictionary, whichever the backend, and the features that
+        the model doesn't know are dropped before they reach the backend,
+        as the model would ignore them anyway. The NumPy backend gets the
+        attribute ids and weights, the SWIG backend crfsuite.Attribute
+        objects and the subprocess backend the line of the known features.
+
+        The compiled item also carries a fingerprint of the known features,
+        which classify() uses to look up the results of sequences that
+        have been classified before.
+        """
+        cached = self.attributes
+        known_fields = []
+        attributes = []
+        for field in fields:
+            attribute = cached[field] if field in cached else self.get_attribute(field)
+            if attribute is not None:
+                known_fields.append(field)
+                attributes.append(attribute)
+
+        return (hashlib.sha1('\t'.join(known_fields)).digest(), self.classifier.compile(known_fields, attributes))
+
+    def classify(self, items):
         """
         Parameters
         ----------
-        vectors : list of str
-            list of features, e.g. 'LEAF\tNum_EDUs=1\r'
-        
+        items : list
+            the compiled features of each item in the sequence, see compile()
+
         Returns
         -------
         seq_prob : float
@@ -39,29 +400,71 @@ class CRFClassifier:
         predictions : list of (str, float) tuples
             list of predition tuples (label, probability)
         """
-        self.classifier.stdin.write('\n'.join(vectors) + "\n\n")
-        self.classifier.stdin.close()
+        if not items:
+            return 1.0, []
 
-        lines = self.classifier.stdout.readlines()
-        
-        if self.classifier.poll():
-            raise OSError('crf_classifier subprocess died')
-        
-        predictions = []
-        for line in lines[1 : ]:
-            line = line.strip()
-            if line != '':
-                fields = line.split(':')
-                label = fields[0]
-                prob = float(fields[1])
-                predictions.append((label, prob))
-        
-        seq_prob = float(lines[0].split('\t')[1])
+        key = tuple(fingerprint for (fingerprint, item) in items)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.classifier.tag([item for (fingerprint, item) in items])
+            self.cache.put(key, result)
+            self.tagged += 1
+
+        return result
+
+    def classify_many(self, sequences):
+        """
+        Classifies several sequences in one round trip to the backend. Only
+        the sequences that aren't cached yet are sent to the backend, and
+        each of them only once.
+
+        Parameters
+        ----------
+        sequences : list of list
+            the compiled items of each sequence, as for classify()
+
+        Returns
+        -------
+        results : list of (float, list of (str, float)) tuples
+            the (seq_prob, predictions) of each sequence, as for classify()
+        """
+        results = [(1.0, [])] * len(sequences)
+
+        # the positions of each uncached sequence, by key
+        missing = OrderedDict()
+        for (i, items) in enumerate(sequences):
+            if not items:
+                continue
+
+            key = tuple(fingerprint for (fingerprint, item) in items)
+            if key in missing:
+                missing[key].append(i)
+                continue
+
+            result = self.cache.get(key)
+            if result is None:
+                missing[key] = [i]
+            else:
+                results[i] = result
+
+        if missing:
+            todo = [[item for (fingerprint, item) in sequences[positions[0]]] for positions in missing.itervalues()]
+            self.tagged += len(todo)
+            for ((key, positions), result) in zip(missing.iteritems(), self.classifier.tag_many(todo)):
+                self.cache.put(key, result)
+                for i in positions:
+                    results[i] = result
+
+        return results
+
+
+    def share(self):
+        """
+        Prepares the classifier to be used by the processes that are forked
+        after this call: they share the model instead of loading their own.
+        """
+        self.classifier.share()
 
-        # re-create classifier (because we had to close STDIN earlier)
-        self.classifier = subprocess.Popen(self.classifier_cmd, shell = True, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
-        return seq_prob, predictions
-    
 
     def poll(self):
         """
@@ -70,10 +473,13 @@ class CRFClassifier:
         if self.classifier is None:
             return True
         else:
-            return self.classifier.poll() != None
-        
-    
+            return self.classifier.poll()
+
+
     def unload(self):
         if self.classifier and not self.poll():
-            self.classifier.stdin.write('\n')
+            self.classifier.unload()
+            if self.verbose:
+                print 'Result cache of %s: %d hits, %d misses' % (self.name, self.cache.hits, self.cache.misses)
             print 'Successfully unloaded %s' % self.name
+        self.cache.clear()
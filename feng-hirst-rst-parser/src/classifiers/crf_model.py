@@ -0,0 +1,205 @@
+"""
+Reader for crfsuite's binary model files (first-order linear-chain CRFs,
+as written by 'crfsuite learn') with Viterbi decoding and forward-backward
+marginals in NumPy, i.e. what 'crfsuite tag -pi' computes.
+
+A model file consists of a header, the label and attribute dictionaries
+(each a CQDB, a constant hash database of strings) and the feature chunk,
+which holds all weights: state features (attribute -> label) and
+transition features (label -> label). The feature references in the file
+are only indices into that chunk, so they aren't needed here.
+
+Reading the dictionaries (read_attributes) doesn't need NumPy, so all the
+CRF backends can look up attribute ids with it.
+"""
+
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+FILEMAGIC = 'lCRF'
+MODELTYPE = 'FOMC'
+HEADER_FORMAT = '<4sI4sIIIIIIIII'
+CHUNK_SIZE = 12
+
+# feature types
+FT_STATE = 0
+FT_TRANS = 1
+
+CQDB_CHUNKID = 'CQDB'
+CQDB_BYTEORDER_CHECK = 0x62445371
+CQDB_HEADER_FORMAT = '<4sIIIII'
+
+
+def read_cqdb(data, offset):
+    """
+    Returns the strings of the CQDB at the given offset of data, as a list
+    indexed by their ids.
+    """
+    (chunkid, size, flag, byteorder, bwd_size, bwd_offset) = struct.unpack_from(CQDB_HEADER_FORMAT, data, offset)
+    if chunkid != CQDB_CHUNKID or byteorder != CQDB_BYTEORDER_CHECK:
+        raise ValueError('Invalid CQDB chunk at offset %d' % offset)
+
+    strings = []
+    for record in struct.unpack_from('<%dI' % bwd_size, data, offset + bwd_offset):
+        # each record consists of the id, the size of the key (including
+        # the terminating NUL) and the key
+        (key_size, ) = struct.unpack_from('<I', data, offset + record + 4)
+        start = offset + record + 8
+        strings.append(data[start : start + key_size - 1])
+
+    return strings
+
+
+def read_header(data, model_fname):
+    """
+    Returns the fields of the header of the model file's data, see
+    HEADER_FORMAT.
+    """
+    header = struct.unpack_from(HEADER_FORMAT, data)
+    (magic, size, model_type) = header[ : 3]
+    if magic != FILEMAGIC or model_type != MODELTYPE:
+        raise ValueError('%s is not a crfsuite model of a first-order linear-chain CRF' % model_fname)
+
+    return header
+
+
+def read_attributes(model_fname):
+    """
+    Returns the ids of the model's attributes by name, without loading its
+    weights.
+    """
+    with open(model_fname, 'rb') as model_file:
+        data = model_file.read()
+
+    # the offset of the attribute dictionary
+    off_attrs = read_header(data, model_fname)[9]
+    return dict((attr, aid) for (aid, attr) in enumerate(read_cqdb(data, off_attrs)))
+
+
+def logsumexp(a, axis):
+    a_max = a.max(axis = axis)
+    return a_max + numpy.log(numpy.exp(a - numpy.expand_dims(a_max, axis)).sum(axis = axis))
+
+
+class CRFModel:
+    """A crfsuite model, loaded into NumPy arrays."""
+    def __init__(self, model_fname):
+        if numpy is None:
+            raise OSError('NumPy is not installed')
+
+        with open(model_fname, 'rb') as model_file:
+            data = model_file.read()
+
+        (magic, size, model_type, version, num_features, num_labels, num_attrs,
+         off_features, off_labels, off_attrs, off_labelrefs, off_attrrefs) = read_header(data, model_fname)
+
+        self.labels = read_cqdb(data, off_labels)
+        self.attributes = dict((attr, aid) for (aid, attr) in enumerate(read_cqdb(data, off_attrs)))
+        self.num_labels = num_labels
+
+        # the header's num_features is not filled in, but the feature chunk
+        # has its own count
+        (chunk, chunk_size, num_features) = struct.unpack_from('<4sII', data, off_features)
+
+        # type, source, destination and weight of each feature
+        features = numpy.frombuffer(data, dtype = numpy.dtype([('type', '<u4'), ('src', '<u4'), ('dst', '<u4'), ('weight', '<f8')]),
+                                    count = num_features, offset = off_features + CHUNK_SIZE)
+
+        transitions = features[features['type'] == FT_TRANS]
+        self.trans = numpy.zeros((num_labels, num_labels))
+        self.trans[transitions['src'], transitions['dst']] = transitions['weight']
+
+        # the state features of each attribute, i.e. the labels and weights
+        # state_labels[k], state_weights[k] for attr_ptr[aid] <= k < attr_ptr[aid + 1]
+        states = features[features['type'] == FT_STATE]
+        states = states[numpy.argsort(states['src'], kind = 'mergesort')]
+        self.state_labels = states['dst'].astype(numpy.intp)
+        self.state_weights = states['weight'].astype(numpy.float64)
+        self.attr_ptr = numpy.zeros(num_attrs + 1, dtype = numpy.intp)
+        numpy.cumsum(numpy.bincount(states['src'], minlength = num_attrs), out = self.attr_ptr[1 : ])
+
+    def state_scores(self, aids, values, rows, num_rows):
+        """
+        Returns the (num_rows, num_labels) array of state scores for the
+        attributes aids with weights values, where attribute k belongs to
+        item (row) rows[k].
+        """
+        L = self.num_labels
+        if len(aids) == 0:
+            return numpy.zeros((num_rows, L))
+
+        starts = self.attr_ptr[aids]
+        counts = self.attr_ptr[aids + 1] - starts
+        # the indices of all the state features of all the attributes
+        idx = numpy.arange(counts.sum()) + numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts)
+
+        scores = numpy.bincount(numpy.repeat(rows, counts) * L + self.state_labels[idx],
+                                weights = self.state_weights[idx] * numpy.repeat(values, counts),
+                                minlength = num_rows * L)
+        return scores.reshape((num_rows, L))
+
+    def viterbi(self, state):
+        """
+        Returns the best label paths for the (num_sequences, T, num_labels)
+        array of state scores of equally long sequences, and their scores.
+        """
+        (B, T, L) = state.shape
+        back = numpy.zeros((B, T, L), dtype = numpy.intp)
+
+        score = state[:, 0]
+        for t in range(1, T):
+            # argmax picks the first maximum, like crfsuite does
+            candidates = score[:, :, None] + self.trans
+            back[:, t] = candidates.argmax(axis = 1)
+            score = candidates.max(axis = 1) + state[:, t]
+
+        path = numpy.zeros((B, T), dtype = numpy.intp)
+        path[:, T - 1] = score.argmax(axis = 1)
+        for t in range(T - 1, 0, -1):
+            path[:, t - 1] = back[numpy.arange(B), t, path[:, t]]
+
+        return path, score.max(axis = 1)
+
+    def marginals(self, state):
+        """
+        Returns the marginal label probabilities for the (num_sequences, T,
+        num_labels) array of state scores, and the log of the normalization
+        factor of each sequence.
+        """
+        T = state.shape[1]
+        alpha = numpy.empty_like(state)
+        beta = numpy.zeros_like(state)
+
+        alpha[:, 0] = state[:, 0]
+        for t in range(1, T):
+            alpha[:, t] = state[:, t] + logsumexp(alpha[:, t - 1, :, None] + self.trans, axis = 1)
+
+        for t in range(T - 2, -1, -1):
+            beta[:, t] = logsumexp(self.trans + (state[:, t + 1] + beta[:, t + 1])[:, None, :], axis = 2)
+
+        lognorm = logsumexp(alpha[:, T - 1], axis = 1)
+        return numpy.exp(alpha + beta - lognorm[:, None, None]), lognorm
+
+    def tag(self, state):
+        """
+        Tags equally long sequences, given their (num_sequences, T,
+        num_labels) array of state scores. Returns for each sequence the
+        probability of its best label sequence and a list of (label,
+        marginal probability) tuples.
+        """
+        (B, T, L) = state.shape
+        (path, score) = self.viterbi(state)
+        (marginals, lognorm) = self.marginals(state)
+
+        seq_probs = numpy.exp(score - lognorm)
+        path_marginals = marginals[numpy.arange(B)[:, None], numpy.arange(T)[None, :], path]
+
+        results = []
+        for b in range(B):
+            results.append((seq_probs[b], [(self.labels[y], prob) for (y, prob) in zip(path[b], path_marginals[b])]))
+        return results
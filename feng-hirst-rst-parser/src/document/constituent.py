@@ -5,7 +5,6 @@ Created on Aug 8, 2013
 '''
 import utils.utils
 from trees.parse_tree import ParseTree
-import sys
 
 class Constituent:
     def __init__(self, parse_subtree, doc, l_start, l_end, r_end, start_sent_id, end_sent_id):
@@ -24,6 +23,10 @@ class Constituent:
         self.main_edus = None
         self.left_child = None
         self.right_child = None
+        
+        # see get_num_tokens and get_ngram
+        self.num_tokens = None
+        self.ngrams = {}
     
     def __str__(self):
         return self.print_span()
@@ -61,7 +64,7 @@ class Constituent:
         if self.l_start == self.r_end - 1:
             return True
         
-        if utils.utils.find_EDU_in_sentence_index(self.doc.cuts, self.l_start) == utils.utils.find_EDU_in_sentence_index(self.doc.cuts, self.r_end - 1):
+        if self.doc.get_sentence_id(self.l_start) == self.doc.get_sentence_id(self.r_end - 1):
             return True
         else:
             return False
@@ -81,12 +84,14 @@ class Constituent:
         
         assert self.r_end > self.l_start + 1
         
-        t = self.get_subtree_in_span(pos)
-        return 1 if not isinstance(t, ParseTree) else len(t.leaves())
+        if pos == 'L':
+            return self.l_end - self.l_start
+        else:
+            return self.r_end - self.l_end
     
     def get_num_edus(self):
-        t = self.parse_subtree
-        return 1 if not isinstance(t, ParseTree) else len(t.leaves())
+        # the leaves of the subtree are the EDUs of the span
+        return self.r_end - self.l_start
     
     def get_num_edus_in_left(self):
         return self.get_num_edus_in_span('L')
@@ -107,14 +112,16 @@ class Constituent:
             return t.label()
     
     def get_num_tokens(self):
-        if self.get_num_edus() == 1:
-            return len(self.doc.edus[self.l_start])
-        else:
-            num_tokens = 0
-            for i in range(self.l_end, self.r_end):
-                num_tokens += len(self.doc.edus[i])
+        if self.num_tokens is None:
+            offsets = self.doc.get_edu_word_offsets()
+            if self.get_num_edus() == 1:
+                self.num_tokens = offsets[self.l_start + 1] - offsets[self.l_start]
+            else:
+                # the tokens of the right span only, which is what the models
+                # have been trained with
+                self.num_tokens = offsets[self.r_end] - offsets[self.l_end]
         
-            return num_tokens
+        return self.num_tokens
         
         
     def get_left_subtree_rel(self):
@@ -131,78 +138,40 @@ class Constituent:
     
     
     def get_ngram(self, n):
-#        print self.parse_subtree
-        if isinstance(self.parse_subtree, ParseTree):
-            leaves = []
-            for leaf in self.parse_subtree.leaves():
-                leaves.extend(leaf)
-        else:
-            leaves = self.parse_subtree
-        
-        if n > 0:
-            start = 0
-            end = min(n, len(leaves))
-        else:
-            start = max(0, len(leaves) + n)
-            end = len(leaves)
-        
-        ngrams = []
-        for i in range(start, end):
-#            print leaves[i]
-            ngrams.append(leaves[i].lower())
+        if n not in self.ngrams:
+            offsets = self.doc.get_edu_word_offsets()
+            start = offsets[self.l_start]
+            end = offsets[self.r_end]
+            
+            if n > 0:
+                end = min(start + n, end)
+            else:
+                start = max(start, end + n)
+            
+            self.ngrams[n] = self.doc.get_edu_words()[start : end]
                 
         #print ngrams
-        return ngrams
+        return self.ngrams[n]
       
     
     def get_POS_ngram(self, n):
         if n > 0:
-            t = self.doc.sentences[self.start_sent_id].parse_tree
+            table = self.doc.sentences[self.start_sent_id].get_token_table()
             start = self.start_word
-            end = min(self.start_word + n, len(t.leaves()))
+            end = min(self.start_word + n, table.length)
             
             if self.start_sent_id == self.end_sent_id:
                 end = min(end, self.end_word)
-            
-#            print n
-#            print 'start', start, 'end', end
-#            print t
-#            print self.doc.edu_word_segmentation[self.start_sent_id]
-#            print self.doc.edus[self.l_start]
         else:
-            t = self.doc.sentences[self.end_sent_id].parse_tree
+            table = self.doc.sentences[self.end_sent_id].get_token_table()
             start = max(0, self.end_word + n)
             end = self.end_word
             
             if self.start_sent_id == self.end_sent_id:
                 start = max(self.start_word, start)
         
-#            print n
-#            print 'start', start, 'end', end
-#            print t
-#            print self.doc.edu_word_segmentation[self.end_sent_id]
-#            print self.doc.edus[self.r_end - 1]
-#        
-        ngrams = []
-        for i in range(start, end):
-            try:
-                ngrams.append(t[t.leaf_treeposition(i)[ : -1]].label())
-            except Exception, e:
-                print self.l_start, self.l_end, self.r_end
-                print self.parse_subtree
-#                print self.cuts[self.start_sent_id]
-#                print self.cuts[self.end_sent_id]
-                print 'start_sent', self.start_sent_id, 'start_word', self.start_word, 'end_sent_id', self.end_sent_id, 'end_word', self.end_word
-                print len(t.leaves()), t
-                 
-                print 'start, end: ', start, end
-                print
-                
-                sys.exit(1)
-        
+        ngrams = table.pos_tags[start : end]
 #        print ngrams
-#        print
-        #print ngrams
         return ngrams
 #        return '-'.join(ngrams)
 
@@ -6,6 +6,24 @@ Created on Aug 8, 2013
 from base_representation import BaseRepresentation
 
 class Document(BaseRepresentation):
+    # the lowercased words of all the EDUs, the offset of each EDU's first
+    # word in them, the sentence of each EDU and the EDU of each token of
+    # each sentence, see index_edus
+    edu_words = None
+    edu_word_offsets = None
+    edu_sentence_ids = None
+    token_edu_ids = None
+    
+    # whether the tree building budget ran out, so that part of the
+    # discourse tree was joined without the classifiers
+    degraded = False
+    # the number of CRF sequences classified while its tree was built, if
+    # it had a budget
+    crf_calls = None
+    
+    # how the document-level tree was built, see CRFTreeBuilder.build_tree
+    decoding = None
+    
     def __init__(self, 
                  ssplit_filename = None, 
                  dis_filename = None, 
@@ -31,11 +49,65 @@ class Document(BaseRepresentation):
     
     def add_sentence(self, sentence):
         self.sentences.append(sentence)
+    
+    def index_edus(self):
+        """
+        Builds the index of the segmented document: the word array of the
+        EDUs and the prefix sums of their lengths, so that the words of any
+        span of EDUs, and their number, can be looked up without flattening
+        the span, and the EDU <-> sentence maps. The EDU range of each
+        sentence is in cuts.
+        """
+        self.edu_words = []
+        self.edu_word_offsets = [0]
+        for edu in self.edus:
+            self.edu_words.extend(word.lower() for word in edu)
+            self.edu_word_offsets.append(len(self.edu_words))
+        
+        self.edu_sentence_ids = []
+        self.token_edu_ids = []
+        for (sent_id, (start_edu, end_edu)) in enumerate(self.cuts):
+            self.edu_sentence_ids.extend([sent_id] * (end_edu - start_edu))
+            
+            token_edu_ids = []
+            for (i, (start_word, end_word)) in enumerate(self.edu_word_segmentation[sent_id]):
+                token_edu_ids.extend([start_edu + i] * (end_word - start_word))
+            self.token_edu_ids.append(token_edu_ids)
+    
+    def check_edu_index(self):
+        # the index is rebuilt if the document has been segmented again
+        if self.edu_word_offsets is None or len(self.edu_word_offsets) != len(self.edus) + 1:
+            self.index_edus()
+    
+    def get_edu_word_offsets(self):
+        self.check_edu_index()
+        return self.edu_word_offsets
+    
+    def get_edu_words(self):
+        self.check_edu_index()
+        return self.edu_words
+    
+    def get_sentence_id(self, edu_index):
+        """Returns the index of the sentence of the EDU, or None."""
+        self.check_edu_index()
+        if 0 <= edu_index < len(self.edu_sentence_ids):
+            return self.edu_sentence_ids[edu_index]
+    
+    def get_edu_id(self, sent_id, token_offset):
+        """Returns the index of the EDU of the given token of the sentence, or None."""
+        self.check_edu_index()
+        token_edu_ids = self.token_edu_ids[sent_id]
+        if 0 <= token_offset < len(token_edu_ids):
+            return token_edu_ids[token_offset]
         
     def preprocess(self, raw_filename, preprocesser):
         preprocesser.preprocess(raw_filename, self)
         self.preprocessed = True
         
+    def preprocess_text(self, text, preprocesser):
+        preprocesser.preprocess_text(text, self)
+        self.preprocessed = True
+        
         
     def get_bottom_level_constituents(self):
         constituents = []
@@ -6,8 +6,12 @@ Created on 2014-01-09
 import utils.rst_lib
 from base_representation import BaseRepresentation
 from constituent import Constituent
+from token_table import TokenTable
 
 class Sentence(BaseRepresentation):
+    # the table of the tokens, see get_token_table
+    token_table = None
+    
     def __init__(self, sent_id, raw_text, doc):
         BaseRepresentation.__init__(self)
         
@@ -24,14 +28,30 @@ class Sentence(BaseRepresentation):
     
     def set_unlexicalized_tree(self, tree):
         self.unlexicalized_parse_tree = tree
+        self.token_table = None
     
     def set_lexicalized_tree(self, tree):
         self.parse_tree = tree
+        self.token_table = None
         
     def add_token(self, token):
         assert len(self.tokens) == token.id - 1
         
         self.tokens.append(token)
+        self.token_table = None
+    
+    def build_token_table(self):
+        self.token_table = TokenTable(self)
+    
+    def get_token_table(self):
+        """
+        Returns the table of the tokens' words, PoS tags and tree positions.
+        It's built after preprocessing, or on the first lookup if the tokens
+        or the trees have been changed since.
+        """
+        if self.token_table is None:
+            self.build_token_table()
+        return self.token_table
         
     def add_dependency(self, dep):
         self.dependencies.append(dep)
@@ -44,9 +64,7 @@ class Sentence(BaseRepresentation):
             start = max(0, token_offset + n)
             end = token_offset
         
-        ngrams = []
-        for i in range(start, end):
-            ngrams.append(self.tokens[i].word.lower())
+        ngrams = self.get_token_table().lowercased_words[start : end]
                 
         #print ngrams
         return ngrams
@@ -60,18 +78,11 @@ class Sentence(BaseRepresentation):
             start = max(0, token_offset + n)
             end = token_offset
 
-        ngrams = []
-        for i in range(start, end):
-            ngrams.append(self.parse_tree[self.parse_tree.leaf_treeposition(i)[ : -1]].label())
-        
-        return ngrams
+        return self.get_token_table().pos_tags[start : end]
     
     
     def get_edu(self, token_id):
-        for i in range(self.start_edu, self.end_edu):
-            (start_word, end_word) = self.doc.edu_word_segmentation[self.sent_id][i - self.start_edu]
-            if token_id >= start_word and token_id < end_word:
-                return i
+        return self.doc.get_edu_id(self.sent_id, token_id)
             
             
     def get_bottom_level_constituents(self):
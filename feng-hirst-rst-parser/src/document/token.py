@@ -39,27 +39,17 @@ class Token:
         
         
     def get_treepos(self):
-        if self.sentence.parse_tree is not None:
-            return self.sentence.parse_tree.leaf_treeposition(self.id - 1)
-        elif self.sentence.unlexicalized_parse_tree is not None:
-            return self.sentence.unlexicalized_parse_tree.leaf_treeposition(self.id - 1)
+        return self.sentence.get_token_table().treepositions[self.id - 1]
     
     def get_PoS_tag(self):
         if not self.pos:
-            if self.sentence.parse_tree is not None:
-                t = self.sentence.parse_tree
-                self.pos = t[self.get_treepos()[ : -1]].label()
-                
-            elif self.sentence.unlexicalized_parse_tree is not None:
-                t = self.sentence.unlexicalized_parse_tree
-            
-                self.pos = t[self.get_treepos()[ : -1]].label()
+            self.pos = self.sentence.get_token_table().pos_tags[self.id - 1]
                 
         return self.pos
     
     
     def is_sentence_end(self):
-        return self.id == len(self.sentence.parse_tree.leaves())
+        return self.id == self.sentence.get_token_table().length
     
     
     def is_sentence_begin(self):
@@ -67,4 +57,4 @@ class Token:
     
     
     def get_relative_position(self):
-        return (self.id - 1) * 1.0 / (len(self.sentence.parse_tree.leaves()) - 1)
+        return (self.id - 1) * 1.0 / (self.sentence.get_token_table().length - 1)
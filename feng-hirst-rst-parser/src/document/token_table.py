@@ -0,0 +1,46 @@
+"""
+Per-sentence table of the tokens: their words, lowercased and unescaped,
+their PoS tags and leaf positions in the parse tree, and the length of the
+sentence. The feature writers look tokens up in the table instead of
+walking the parse tree for each lookup.
+"""
+
+from utils.utils import unescape_penn_special_word
+
+
+class TokenTable:
+    def __init__(self, sentence):
+        # the tree the tokens' positions and tags are taken from, see Token.get_treepos
+        tree = sentence.parse_tree
+        if tree is None:
+            tree = sentence.unlexicalized_parse_tree
+
+        self.words = [token.word for token in sentence.tokens]
+        self.lowercased_words = [word.lower() for word in self.words]
+        self.unescaped_words = [unescape_penn_special_word(word) for word in self.words]
+
+        if tree is None:
+            self.treepositions = [None] * len(self.words)
+            self.pos_tags = [token.pos for token in sentence.tokens]
+            self.length = len(self.words)
+        else:
+            if tree.leaf_positions is None:
+                tree.index_leaves()
+            self.treepositions = tree.leaf_positions
+            self.pos_tags = [tree[pos[ : -1]].label() for pos in self.treepositions]
+            self.length = len(self.treepositions)
+
+    def get_spanning_treeposition(self, start, end):
+        """
+        Returns the tree position of the lowest subtree that spans the tokens
+        start to end (exclusive), like ParentedTree.treeposition_spanning_leaves.
+        """
+        if end <= start:
+            raise ValueError('end must be greater than start')
+
+        start_treepos = self.treepositions[start]
+        end_treepos = self.treepositions[end - 1]
+        for i in range(len(start_treepos)):
+            if i == len(end_treepos) or start_treepos[i] != end_treepos[i]:
+                return start_treepos[ : i]
+        return start_treepos
@@ -15,9 +15,10 @@ class SegmenterFeatureWriter:
         pass
     
     def write_token_identity_features(self, token, unit, position):
-        self.features.add('PoS=%s_Unit%d@%d' % (token.get_PoS_tag(), unit, position))
+        table = token.sentence.get_token_table()
+        self.features.add('PoS=%s_Unit%d@%d' % (table.pos_tags[token.id - 1], unit, position))
         
-        self.features.add('Word=%s_Unit%d@%d' % (token.word.lower(), unit, position))
+        self.features.add('Word=%s_Unit%d@%d' % (table.lowercased_words[token.id - 1], unit, position))
         
         if token.is_sentence_begin():
             self.features.add('Is_Sentence_Begin_Unit%d@%d' % (unit, position))
@@ -107,11 +108,12 @@ class SegmenterFeatureWriter:
 #        r_boundary = self.find_neighbouring_boundary(token, edu_segmentation, 'R')
         
         (l_boundary, r_boundary) = offset2neighbouring_boundaries[token.id - 1] 
+        table = token.sentence.get_token_table()
         
         if l_boundary is not None:
             start = l_boundary
-            self.features.add('L_Boundary_Word=%s_Unit%d@%d' % (token.sentence.tokens[l_boundary].word.lower(), unit, position))      
-            self.features.add('L_Boundary_POS=%s_Unit%d@%d' % (token.sentence.tokens[l_boundary].get_PoS_tag(), unit, position))
+            self.features.add('L_Boundary_Word=%s_Unit%d@%d' % (table.lowercased_words[l_boundary], unit, position))      
+            self.features.add('L_Boundary_POS=%s_Unit%d@%d' % (table.pos_tags[l_boundary], unit, position))
             self.features.add('Distance_to_L_Neighbouring_Boundary=%d_Unit%d@%d' % (token.id - l_boundary, unit, position))
         
             self.write_global_features_for_span((l_boundary, token.id), token, unit, position)
@@ -122,8 +124,8 @@ class SegmenterFeatureWriter:
         if r_boundary is not None:
             end = r_boundary
             
-            self.features.add('R_Boundary_Word=%s_Unit%d@%d' % (token.sentence.tokens[r_boundary - 1].word.lower(), unit, position))
-            self.features.add('R_Boundary_POS=%s_Unit%d@%d' % (token.sentence.tokens[r_boundary - 1].get_PoS_tag(), unit, position))
+            self.features.add('R_Boundary_Word=%s_Unit%d@%d' % (table.lowercased_words[r_boundary - 1], unit, position))
+            self.features.add('R_Boundary_POS=%s_Unit%d@%d' % (table.pos_tags[r_boundary - 1], unit, position))
             self.features.add('Distance_to_R_Neighbouring_Boundary=%d_Unit%d@%d' % (r_boundary - token.id + 1, unit, position))
         
             self.write_global_features_for_span((token.id - 1, r_boundary), token, unit, position)
@@ -180,7 +182,7 @@ class SegmenterFeatureWriter:
         
 #        print start, end
         
-        ancestor_treepos = tree.treeposition_spanning_leaves(start, end)
+        ancestor_treepos = token.sentence.get_token_table().get_spanning_treeposition(start, end)
             
         ancestor_subtree = tree[ancestor_treepos]
         if not isinstance(ancestor_subtree, Tree):
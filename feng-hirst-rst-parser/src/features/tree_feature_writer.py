@@ -99,7 +99,7 @@ class CRFTreeFeatureWriter:
         if l_start_sent == l_end_sent:
             t = L.doc.sentences[l_start_sent].parse_tree
             
-            l_ancestor_pos = t.treeposition_spanning_leaves(l_start_word, l_end_word)
+            l_ancestor_pos = L.doc.sentences[l_start_sent].get_token_table().get_spanning_treeposition(l_start_word, l_end_word)
             if l_end_word == l_start_word + 1:
                 l_ancestor_pos = l_ancestor_pos[ : -1]
                 
@@ -130,7 +130,7 @@ class CRFTreeFeatureWriter:
             t = R.doc.sentences[r_start_sent].parse_tree
 
             
-            r_ancestor_pos = t.treeposition_spanning_leaves(r_start_word, r_end_word)
+            r_ancestor_pos = R.doc.sentences[r_start_sent].get_token_table().get_spanning_treeposition(r_start_word, r_end_word)
             if r_end_word == r_start_word + 1:
                 r_ancestor_pos = r_ancestor_pos[ : -1]
                 
@@ -6,6 +6,7 @@ Created on 2014-01-17
 
 from segmenters.crf_segmenter import CRFSegmenter
 from treebuilder.build_tree_CRF import CRFTreeBuilder
+from classifiers.crf_classifier import BACKENDS, DEFAULT_BACKEND
 
 from optparse import OptionParser
 from copy import deepcopy
@@ -16,15 +17,38 @@ import sys
 from document.doc import Document
 import time
 import traceback
+import multiprocessing
+from multiprocessing.queues import SimpleQueue
 from datetime import datetime
+import hashlib
 
 from logs.log_writer import LogWriter
 from prep.preprocesser import Preprocesser
+from prep.parse_cache import DEFAULT_CACHE_SIZE
 
 import utils.serialize
 
 PARA_END_RE = re.compile(r' (<P>|<s>)$')
 
+# the characters that are kept when a document id is made into a file name
+UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^A-Za-z0-9._-]')
+
+# estimated memory use of one parser process in MB (mostly the Stanford parser's JVM heap)
+WORKER_MEMORY = 1500
+
+# estimated memory use of each additional Stanford parser process in MB
+SYNTAX_PARSER_MEMORY = 1000
+
+# estimated memory use of a worker forked from a loaded parser in MB, i.e.
+# what it doesn't share with the parser it was forked from
+POOL_WORKER_MEMORY = 250
+
+# the kinds of messages parse_worker puts into the result queue
+WORKER_STARTED_FILE, WORKER_FINISHED_FILE, WORKER_FAILED_TO_START = range(3)
+
+# how often the workers are checked while there are no results, in seconds
+WORKER_POLL_INTERVAL = 0.1
+
 
 class DiscourseParser():
     def __init__(self, options, output_dir = None, 
@@ -33,6 +57,15 @@ class DiscourseParser():
         self.skip_parsing = options.skip_parsing
         self.global_features = options.global_features
         self.save_preprocessed_doc = options.save_preprocessed_doc
+        self.crf_backend = options.crf_backend
+        self.syntax_parsers = options.syntax_parsers
+        self.parse_cache = options.parse_cache
+        self.parse_cache_size = options.parse_cache_size
+        self.incremental = options.incremental
+        self.sentence_workers = options.sentence_workers
+        self.time_budget = options.time_budget
+        self.crf_call_budget = options.crf_call_budget
+        self.shift_reduce_edus = options.shift_reduce_edus
         
         self.output_dir = os.path.join(paths.OUTPUT_PATH, output_dir if output_dir is not None else '')
         if not os.path.exists(self.output_dir):
@@ -47,14 +80,17 @@ class DiscourseParser():
 
         self.preprocesser = None
         try:
-            self.preprocesser = Preprocesser()
+            self.preprocesser = Preprocesser(syntax_parsers = self.syntax_parsers,
+                                             parse_cache_dir = self.parse_cache,
+                                             parse_cache_size = self.parse_cache_size)
         except Exception, e:
             print "*** Loading Preprocessing module failed..."
             print traceback.print_exc()
 
             raise e
         try:
-            self.segmenter = CRFSegmenter(_name = self.feature_sets, verbose = self.verbose, global_features = self.global_features)
+            self.segmenter = CRFSegmenter(_name = self.feature_sets, verbose = self.verbose, global_features = self.global_features,
+                                          crf_backend = self.crf_backend)
         except Exception, e:
             print "*** Loading Segmentation module failed..."
             print traceback.print_exc()
@@ -63,7 +99,13 @@ class DiscourseParser():
         
         try:        
             if not self.skip_parsing:
-                self.treebuilder = CRFTreeBuilder(_name = self.feature_sets, verbose = self.verbose) 
+                self.treebuilder = CRFTreeBuilder(_name = self.feature_sets, verbose = self.verbose,
+                                                  crf_backend = self.crf_backend,
+                                                  incremental = self.incremental,
+                                                  sentence_workers = self.sentence_workers,
+                                                  time_budget = self.time_budget,
+                                                  crf_call_budget = self.crf_call_budget,
+                                                  shift_reduce_edus = self.shift_reduce_edus)
             else:
                 self.treebuilder = None
         except Exception, e:
@@ -77,6 +119,38 @@ class DiscourseParser():
         print       
     
         
+    def share(self):
+        """
+        Prepares the parser to be used by several processes forked after
+        this call. The models loaded in this process are shared copy-on-write,
+        and the Stanford parser and crfsuite processes are shared by taking
+        turns instead of being started once per process.
+        """
+        if self.preprocesser is not None:
+            self.preprocesser.share()
+        
+        self.segmenter.share()
+        
+        if not self.treebuilder is None:
+            self.treebuilder.share()
+    
+    
+    def stats(self):
+        """
+        Returns the current stats of the parser's components while it's
+        running, i.e. those of the Stanford parser process (or pool, and
+        parse cache) under 'syntax_parser', and those of the tree builder
+        (see CRFTreeBuilder.stats) under 'tree_building'.
+        """
+        stats = {}
+        if self.preprocesser is not None:
+            stats['syntax_parser'] = self.preprocesser.syntax_parser.stats()
+        if self.treebuilder is not None:
+            stats['tree_building'] = self.treebuilder.stats()
+        
+        return stats
+    
+        
     def unload(self):
         if self.preprocesser is not None:
             self.preprocesser.unload()
@@ -88,7 +162,13 @@ class DiscourseParser():
             self.treebuilder.unload()
         
     
-    def parse(self, filename):
+    def parse(self, filename, status = None):
+        """
+        Parses the file and writes its tree to <filename>.tree in the
+        output directory. Returns the discourse tree with the plain EDU
+        texts. If status is a dict, status['degraded'] tells whether the
+        tree building budget ran out, as for parse_text.
+        """
         result = None
 
         if not os.path.exists(filename):
@@ -201,26 +281,25 @@ class DiscourseParser():
                 print 'Finished tree building.'
     
                 if pt is None:
+                    # the parser stays loaded for the next file
                     print "No tree could be built..."
-                        
-                    if not self.treebuilder is None:
-                        self.treebuilder.unload()
+                    self.log_writer.write('No tree could be built for %s.' % filename)
     
                     return -1
                                  
     #           Unescape the parse tree
                 if pt:
                     doc.discourse_tree = pt
-                    result = deepcopy(pt)
                     treeBuildEnd = time.time()
                     
                     print 'Finished tree building in %.2f seconds.' % (treeBuildEnd - treeBuildStart)  
                     self.log_writer.write('Finished tree building in %.2f seconds.' % (treeBuildEnd - treeBuildStart))
+                    if doc.degraded:
+                        self.log_writer.write('Tree building ran out of budget, the tree is degraded.')
+                    if status is not None:
+                        status['degraded'] = doc.degraded
                     
-                    for i in range(len(doc.edus)):
-                        edu_str = ' '.join(doc.edus[i])
-                        pt.__setitem__(pt.leaf_treeposition(i), '_!%s!_' % edu_str) # parse tree with escape symbols
-                        result.__setitem__(pt.leaf_treeposition(i), PARA_END_RE.sub('', edu_str)) # parse tree without escape symbols
+                    result = insert_edus(pt, doc.edus)
                     
                     out = pt.pformat()
                     print 'Output tree building result to %s.' % outfname
@@ -241,6 +320,362 @@ class DiscourseParser():
     
         print '==================================================='
         return result
+    
+    
+    def parse_text(self, text, doc_id = None, timings = None, status = None, decoding = None):
+        """
+        Parses the text in memory, without any input or output files.
+        Returns the discourse tree, whose leaves are the texts of the EDUs,
+        and the list of these texts. The tree is None in skip_parsing mode
+        or if no tree could be built.
+        
+        Only with save_preprocessed_doc and a doc_id, the document data is
+        saved to (and loaded from) <doc_id>.doc.ser in the output directory,
+        like parse does for files, with the doc_id made safe as a file name
+        (see get_doc_filename). If timings is a dict, the seconds spent
+        on preprocessing, segmentation and tree building are stored in it.
+        If status is a dict, status['degraded'] tells whether the tree
+        building budget ran out, so that part of the tree was joined
+        right-branching instead of being parsed, status['crf_calls'] how
+        many CRF sequences were classified (only with a budget), and
+        status['decoding'] how the document-level tree was built. decoding is 'greedy',
+        'shift-reduce' or None, i.e. the one for the document's length
+        (see shift_reduce_edus).
+        """
+        if timings is None:
+            timings = {}
+        if status is None:
+            status = {}
+        
+        self.log_writer.write('***** Parsing %s...' % (doc_id if doc_id is not None else 'text'))
+        
+        save_doc = self.save_preprocessed_doc and doc_id is not None
+        doc_fname = get_doc_filename(doc_id) if save_doc else None
+        doc = None
+        if save_doc and os.path.exists(os.path.join(self.output_dir, '%s.doc.ser' % doc_fname)):
+            doc = utils.serialize.loadData(doc_fname, self.output_dir, '.doc.ser')
+        
+        if doc is None or not doc.preprocessed:
+            start = time.time()
+            doc = Document()
+            doc.preprocess_text(text, self.preprocesser)
+            timings['preprocessing'] = time.time() - start
+            
+            if save_doc:
+                utils.serialize.saveData(doc_fname, doc, self.output_dir, '.doc.ser')
+        
+        if not doc.segmented:
+            start = time.time()
+            self.segmenter.segment(doc)
+            timings['segmentation'] = time.time() - start
+            
+            if save_doc:
+                utils.serialize.saveData(doc_fname, doc, self.output_dir, '.doc.ser')
+        
+        edus = [PARA_END_RE.sub('', ' '.join(edu)) for edu in doc.edus]
+        if self.skip_parsing:
+            return None, edus
+        
+        start = time.time()
+        pt = self.treebuilder.build_tree(doc, decoding)
+        if pt is None:
+            return None, edus
+        
+        result = insert_edus(pt, doc.edus)
+        doc.discourse_tree = pt
+        timings['tree_building'] = time.time() - start
+        status['degraded'] = doc.degraded
+        status['crf_calls'] = doc.crf_calls
+        status['decoding'] = doc.decoding
+        self.log_writer.write('Finished tree building in %.2f seconds.' % timings['tree_building'])
+        if doc.degraded:
+            self.log_writer.write('Tree building ran out of budget, the tree is degraded.')
+        
+        if save_doc:
+            utils.serialize.saveData(doc_fname, doc, self.output_dir, '.doc.ser')
+        
+        return result, edus
+
+def get_doc_filename(doc_id):
+    """
+    Returns the file name (without suffix) for the data of the document
+    with the given id, which stays in the directory it's joined to: the
+    last component of the id as a path, with the characters other than
+    letters, digits, '.', '_' and '-' replaced by '_' and no leading dot.
+    If that changed the id, a hash of the whole id is appended, so that
+    e.g. 'a/x' and 'b/x' don't share a file.
+    """
+    if isinstance(doc_id, unicode):
+        doc_id = doc_id.encode('utf-8')
+    else:
+        doc_id = str(doc_id)
+    
+    fname = UNSAFE_FILENAME_CHARS_RE.sub('_', os.path.basename(doc_id)).lstrip('.')
+    if fname != doc_id:
+        fname = '%s-%s' % (fname, hashlib.sha1(doc_id).hexdigest()[ : 10])
+    return fname
+
+
+def insert_edus(pt, edus):
+    """
+    Replaces the leaves of the discourse tree pt with the text of the EDUs,
+    escaped with _! !_ (in place, as written to .tree files). Returns a copy
+    of the tree with the plain EDU texts, without paragraph/sentence end markers.
+    """
+    result = deepcopy(pt)
+    for i in range(len(edus)):
+        edu_str = ' '.join(edus[i])
+        pt.__setitem__(pt.leaf_treeposition(i), '_!%s!_' % edu_str) # parse tree with escape symbols
+        result.__setitem__(pt.leaf_treeposition(i), PARA_END_RE.sub('', edu_str)) # parse tree without escape symbols
+    
+    return result
+
+
+def get_input_filenames(options, input_path):
+    """
+    Returns the names of the files to parse: the files listed in input_path
+    (with --filelist), the .txt files in input_path (if it is a directory),
+    or input_path itself.
+    """
+    if options.filelist:
+        fnames = []
+        for line in open(input_path).readlines():
+            fname = line.strip()
+            if fname != '':
+                fnames.append(fname)
+        return fnames
+    elif os.path.isdir(input_path):
+        return [os.path.join(input_path, fname) for fname in sorted(os.listdir(input_path)) if fname.endswith('.txt')]
+    else:
+        return [input_path]
+
+
+def filter_parsed_files(fnames, output_dir):
+    """
+    Returns the files which exist and have no .tree in output_dir yet,
+    together with the number of skipped files.
+    """
+    files = []
+    skips = 0
+    for fname in fnames:
+        if os.path.exists(fname):
+            if os.path.exists(os.path.join(output_dir, os.path.split(fname)[1] + '.tree')):
+                skips += 1
+            else:
+                files.append(fname)
+        else:
+            skips += 1
+#            print 'Skip %s since it does not exist.' % fname
+    
+    return files, skips
+
+
+def print_degraded_files(files, degraded):
+    """
+    Prints how many and which of the files ran out of tree building budget,
+    given their indices, if any did.
+    """
+    if degraded:
+        print 'Tree building ran out of budget for %d of %d files: %s' % (len(degraded), len(files), ', '.join(files[i] for i in sorted(degraded)))
+
+
+def get_available_memory():
+    """
+    Returns the memory available for new processes in MB, or None if it
+    can't be determined.
+    """
+    try:
+        for line in open('/proc/meminfo').readlines():
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) / 1024
+    except IOError:
+        pass
+
+
+def get_num_workers(options, num_files):
+    """
+    Returns the number of parser processes to use for num_files files:
+    options.workers, but no more than fit into the memory budget. In pool
+    mode, the workers share one loaded parser.
+    """
+    num_workers = max(1, min(options.workers, num_files))
+    
+    memory_budget = options.memory_budget if options.memory_budget else get_available_memory()
+    parser_memory = WORKER_MEMORY + (options.syntax_parsers - 1) * SYNTAX_PARSER_MEMORY
+    if options.pool and num_workers > 1:
+        memory_use = parser_memory + num_workers * POOL_WORKER_MEMORY
+        max_workers = (memory_budget - parser_memory) / POOL_WORKER_MEMORY if memory_budget is not None else None
+    else:
+        memory_use = num_workers * parser_memory
+        max_workers = memory_budget / parser_memory if memory_budget is not None else None
+    
+    if memory_budget is not None and memory_use > memory_budget:
+        num_workers = max(1, max_workers)
+        print 'Reduced the number of workers to %d to fit into %d MB of memory.' % (num_workers, memory_budget)
+    
+    return num_workers
+
+
+def parse_worker(options, output_dir, log_fname, stdout_fname, task_queue, result_queue, parser = None):
+    """
+    Parses the files from task_queue with a DiscourseParser of its own until
+    it receives None. For each file, it puts a (WORKER_STARTED_FILE, pid,
+    index, None, None, None) tuple into result_queue before parsing it, and
+    a (WORKER_FINISHED_FILE, pid, index, result, error, degraded) tuple
+    after, so that the file it was parsing is known if the worker dies.
+    
+    In pool mode, the worker is forked from a process which has already
+    loaded a shared parser, and uses that one instead.
+    """
+    if stdout_fname:
+        sys.stdout = open(stdout_fname % os.getpid(), 'w')
+    
+    log_writer = open('%s.%d' % (log_fname, os.getpid()), 'w') if log_fname else None
+    
+    shared = parser is not None
+    if shared:
+        parser.log_writer = LogWriter(log_writer)
+    else:
+        try:
+            parser = DiscourseParser(options = options,
+                                     output_dir = output_dir, 
+                                     log_writer = log_writer)
+        except Exception, e:
+            result_queue.put((WORKER_FAILED_TO_START, os.getpid(), None, None, traceback.format_exc(), None))
+            return
+    
+    try:
+        for (i, filename) in iter(task_queue.get, None):
+            result_queue.put((WORKER_STARTED_FILE, os.getpid(), i, None, None, None))
+            try:
+                status = {}
+                result = parser.parse(filename, status)
+                parser.log_writer.write('===================================================')
+                result_queue.put((WORKER_FINISHED_FILE, os.getpid(), i, result, None, status.get('degraded', False)))
+            except Exception, e:
+                result_queue.put((WORKER_FINISHED_FILE, os.getpid(), i, None, traceback.format_exc(), None))
+    finally:
+        # a shared parser is unloaded by the process that loaded it
+        if not shared:
+            parser.unload()
+        parser.log_writer.close()
+        sys.stdout.flush()
+        
+        if stdout_fname:
+            sys.stdout.close()
+            os.remove(stdout_fname % os.getpid())
+            sys.stdout = open(os.devnull, 'w')
+
+
+def parse_files_in_parallel(options, files, num_workers, output_dir = None, log_fname = None, stdout_fname = None, degraded = None):
+    """
+    Parses the files in num_workers processes, each with its own DiscourseParser.
+    Yields an (index, result, error) tuple per file in the order in which
+    the files are finished, error being the traceback if parsing failed.
+    
+    With options.pool, the parser is loaded only once, in this process,
+    and the workers forked from it share it (see DiscourseParser.share).
+    
+    If stdout_fname is given, e.g. 'parser.%d.stdout', each worker redirects
+    its output to that file, with %d replaced by the worker's process id,
+    and removes it when it's done.
+    
+    If a worker dies while parsing a file, e.g. because it was killed for
+    lack of memory, that file is yielded with an error, and a new worker
+    takes over the rest of the dead worker's files.
+    
+    If degraded is a list, the index of each file whose tree building ran
+    out of budget is appended to it, whichever worker parsed it.
+    """
+    shared_parser = None
+    if options.pool:
+        shared_parser = DiscourseParser(options = options,
+                                        output_dir = output_dir)
+        shared_parser.share()
+        sys.stdout.flush()
+    
+    task_queue = multiprocessing.Queue()
+    # unlike a Queue, which sends in a background thread, a SimpleQueue has
+    # sent each message when put returns, so a worker that dies right after
+    # it doesn't lose it
+    result_queue = SimpleQueue()
+    for (i, filename) in enumerate(files):
+        task_queue.put((i, filename))
+    for _ in range(num_workers):
+        task_queue.put(None)
+    
+    # the workers by process id, and the index of the file each is parsing
+    workers = {}
+    parsing = {}
+    
+    def start_worker():
+        worker = multiprocessing.Process(target = parse_worker,
+                                         args = (options, output_dir, log_fname, stdout_fname, task_queue, result_queue, shared_parser))
+        worker.daemon = True
+        worker.start()
+        workers[worker.pid] = worker
+    
+    for _ in range(num_workers):
+        start_worker()
+    
+    try:
+        done = 0
+        while done < len(files):
+            if result_queue.empty():
+                # whatever the exited workers sent is in the queue by now
+                exited = [pid for (pid, worker) in workers.items() if not worker.is_alive()]
+                all_exited = len(exited) == len(workers)
+                if not result_queue.empty():
+                    continue
+                
+                for pid in exited:
+                    if pid not in parsing:
+                        continue
+                    
+                    worker = workers[pid]
+                    i = parsing.pop(pid)
+                    if stdout_fname and os.path.exists(stdout_fname % pid):
+                        os.remove(stdout_fname % pid)
+                    
+                    done += 1
+                    yield (i, None, 'The parser worker %d exited with code %s while parsing %s.' % (pid, worker.exitcode, files[i]))
+                    
+                    # the dead worker didn't take its None from the task queue, so
+                    # a new one parses the files left in it
+                    if done < len(files):
+                        start_worker()
+                        all_exited = False
+                
+                if done < len(files) and all_exited:
+                    raise Exception('All parser workers exited with %d files left to parse.' % (len(files) - done))
+                
+                time.sleep(WORKER_POLL_INTERVAL)
+                continue
+            
+            (message, pid, i, result, error, file_degraded) = result_queue.get()
+            
+            if message == WORKER_FAILED_TO_START:
+                print 'A parser worker failed to start:\n%s' % error
+                continue
+            
+            if message == WORKER_STARTED_FILE:
+                parsing[pid] = i
+                continue
+            
+            del parsing[pid]
+            done += 1
+            if file_degraded and degraded is not None:
+                degraded.append(i)
+            yield (i, result, error)
+    finally:
+        for worker in workers.values():
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+        
+        if shared_parser is not None:
+            shared_parser.unload()
+
 
 def main(options, args):
     parser = None
@@ -254,10 +689,10 @@ def main(options, args):
             output_dir = None
             start_arg = 0
         
+        log_fname = None
         log_writer = None
         if options.logging:
             log_fname = os.path.join(paths.LOGS_PATH, 'log_%s.txt' % (output_dir if output_dir else datetime.now().strftime('%Y_%m_%d_%H_%M_%S')))
-            log_writer = open(log_fname, 'w')
 
         
         if options.filelist:
@@ -265,51 +700,59 @@ def main(options, args):
             if not os.path.exists(file_fname) or not os.path.isfile(file_fname):
                 print 'The specified file list %s is not a file or does not exist' % file_fname
                 return
+        
+        output_path = os.path.join(paths.OUTPUT_PATH, output_dir if output_dir is not None else '')
+        files, skips = filter_parsed_files(get_input_filenames(options, args[start_arg]), output_path)
+        
+        print 'Processing %d documents, skipping %d' % (len(files), skips)
+        
+        num_workers = get_num_workers(options, len(files))
+        if num_workers > 1:
+            print 'Parsing with %d workers' % num_workers
+            
+            results = [None] * len(files)
+            errors = []
+            degraded = []
+            outcomes = parse_files_in_parallel(options, files, num_workers, output_dir, log_fname,
+                                               stdout_fname = 'parser.%d.stdout', degraded = degraded)
+            for (done, (i, result, error)) in enumerate(outcomes):
+                print 'Parsed %s, progress: %.2f (%d out of %d)' % (files[i], (done + 1) * 100.0 / len(files), done + 1, len(files))
+                
+                if error is not None:
+                    print 'Some error occurred while parsing %s:\n%s' % (files[i], error)
+                    errors.append(files[i])
+                results[i] = result
+            
+            print_degraded_files(files, degraded)
+            if errors:
+                raise Exception('Failed to parse %d files: %s' % (len(errors), ', '.join(errors)))
+            
+            return results
+        
+        if log_fname:
+            log_writer = open(log_fname, 'w')
                  
         parser = DiscourseParser(options = options,
                                  output_dir = output_dir, 
                                  log_writer = log_writer)
         
-        files = []
-        skips = 0
-        if options.filelist:
-            file_fname = args[start_arg]
-            for line in open(file_fname).readlines():
-                fname = line.strip()
-                    
-                if os.path.exists(fname):
-                    if os.path.exists(os.path.join(parser.output_dir, os.path.split(fname)[1] + '.tree')):
-                        skips += 1
-                    else:
-                        files.append(fname)
-                else:
-                    skips += 1
-#                    print 'Skip %s since it does not exist.' % fname          
-        else:
-            fname = args[start_arg]
-#            print os.path.join(paths.tmp_folder, os.path.split(fname)[1] + '.xml')
-            if os.path.exists(fname):
-                if os.path.exists(os.path.join(parser.output_dir, os.path.split(fname)[1] + '.tree')):
-                    skips += 1
-                else:
-                    files.append(fname)
-            else:
-                skips += 1
-        
-        print 'Processing %d documents, skipping %d' % (len(files), skips)
-        
+        degraded = []
         for (i, filename) in enumerate(files):
             print 'Parsing %s, progress: %.2f (%d out of %d)' % (filename, i * 100.0 / len(files), i, len(files))
                     
             try:
-                result = parser.parse(filename)
+                status = {}
+                result = parser.parse(filename, status)
                 results.append(result)
+                if status.get('degraded'):
+                    degraded.append(i)
                 
                 parser.log_writer.write('===================================================')
             except Exception, e:
                 print 'Some error occurred, skipping the file'
                 raise e
            
+        print_degraded_files(files, degraded)
         parser.unload()
         return results
         
@@ -320,7 +763,7 @@ def main(options, args):
         raise Exception, traceback.print_exc()
 
 
-def parse_args():
+def parse_args(require_input = True):
     usage = "Usage: %prog [options] input_file/dir"
     
     optParser = OptionParser(usage=usage, version="%prog " + v)
@@ -342,12 +785,48 @@ def parse_args():
     optParser.add_option("-l", "--logging",
                          action="store_true", dest="logging", default=False,
                          help="Perform logging while parsing.")
+    optParser.add_option("-w", "--workers",
+                         type="int", dest="workers", default=1,
+                         help="Parse the input files in WORKERS processes, each with its own parser.")
+    optParser.add_option("-m", "--memory_budget",
+                         type="int", dest="memory_budget", default=0,
+                         help="Limit the number of workers to fit into MEMORY_BUDGET MB (default: the available memory).")
+    optParser.add_option("-p", "--pool",
+                         action="store_true", dest="pool", default=False,
+                         help="Load the parser only once and fork the workers from it, so that they share its models and its Stanford parser and crfsuite processes.")
+    optParser.add_option("-j", "--syntax_parsers",
+                         type="int", dest="syntax_parsers", default=1,
+                         help="Parse the sentences of each document with a pool of SYNTAX_PARSERS Stanford parser processes (default: %default).")
+    optParser.add_option("-c", "--parse_cache",
+                         dest="parse_cache", default=None,
+                         help="Keep the Stanford parser's output for each sentence in the directory PARSE_CACHE and reuse it in later runs.")
+    optParser.add_option("--parse_cache_size",
+                         type="int", dest="parse_cache_size", default=DEFAULT_CACHE_SIZE,
+                         help="Limit the parse cache to PARSE_CACHE_SIZE MB by deleting the least recently used parses (default: %default).")
+    optParser.add_option("-b", "--crf_backend",
+                         type="choice", choices=BACKENDS, dest="crf_backend", default=DEFAULT_BACKEND,
+                         help="Run the CRF models in-process through the crfsuite SWIG binding ('swig') or with NumPy ('numpy'), or in crfsuite processes ('subprocess'). Default: %default.")
+    optParser.add_option("-i", "--incremental",
+                         action="store_true", dest="incremental", default=False,
+                         help="Build the sentence-level trees incrementally, an approximation of the default greedy parsing: after each merge, rescore only the neighbouring pairs and label only the new subtree, in short CRF sequences. Faster on long sentences, but the trees can differ.")
+    optParser.add_option("-n", "--sentence_workers",
+                         type="int", dest="sentence_workers", default=1,
+                         help="Build the sentence-level trees of each document in SENTENCE_WORKERS processes forked from the parser (default: %default). Not used by the workers of -w.")
+    optParser.add_option("--time_budget",
+                         type="float", dest="time_budget", default=None,
+                         help="Spend at most TIME_BUDGET seconds on building the tree of a document; the rest of the tree is joined right-branching.")
+    optParser.add_option("--crf_call_budget",
+                         type="int", dest="crf_call_budget", default=None,
+                         help="Classify at most CRF_CALL_BUDGET CRF sequences (not counting cached results) while building the tree of a document; the rest of the tree is joined right-branching.")
+    optParser.add_option("--shift_reduce_edus",
+                         type="int", dest="shift_reduce_edus", default=None,
+                         help="Build the document-level tree of documents with more than SHIFT_REDUCE_EDUS EDUs in one left-to-right shift-reduce pass, which is faster than the default greedy decoding on long documents.")
     optParser.add_option("-e", "--save",
                          action="store_true", dest="save_preprocessed_doc", default=False,
                          help="Save preprocessed document into serialized file for future use.")
 
     (options, args) = optParser.parse_args()
-    if len(args) == 0:
+    if require_input and len(args) == 0:
         optParser.print_help()
         sys.exit(1)
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python2.7
+
+"""
+Long-lived Feng-Hirst parser process that reads documents from STDIN
+and writes their discourse parses to STDOUT, one JSON object per line.
+
+The parser models (Stanford parser, CRF segmenter and tree builder) are
+loaded only once, when the worker starts. Each input line must contain
+a JSON object of the form
+
+    {"id": "2728617258", "text": "Although they didn't like it, they accepted the offer."}
+
+optionally with the "decoding" of the document-level tree, "greedy" or
+"shift-reduce" (by default, the one for the document's length, see
+--shift_reduce_edus), and for each input line, one JSON object is written
+back:
+
+    {"id": "2728617258",
+     "tree": "ParseTree('Contrast[S][N]', [\"Although they did n't like it ,\", 'they accepted the offer .'])",
+     "edus": ["Although they did n't like it ,", "they accepted the offer ."],
+     "timings": {"preprocessing": 0.41, "segmentation": 0.05, "tree_building": 0.08},
+     "degraded": false,
+     "crf_calls": null,
+     "decoding": "greedy",
+     "stats": {"syntax_parser": {"sentences": 1, "utilisation": 0.02},
+               "tree_building": {"documents": 1, "budget_exhaustions": 0}}}
+
+"degraded" is true if the tree building budget (--time_budget,
+--crf_call_budget) ran out, so that part of the tree was joined
+right-branching instead of being parsed, and with a budget, "crf_calls"
+is the number of CRF sequences classified for the document. "stats" are
+the worker's stats so far (see DiscourseParser.stats), e.g. the queue
+depth of the Stanford parser pool (-j) or the number of documents that
+ran out of budget, so that a running worker can be monitored.
+
+If a document can't be parsed, the output object contains the document's
+id and an "error" message instead. The worker exits when STDIN is closed.
+Since the parser is quite chatty, its own output is discarded (or written
+to STDERR in verbose mode), so that STDOUT only contains the results.
+"""
+
+import json
+import os
+import sys
+import traceback
+
+from parse import DiscourseParser, parse_args
+
+
+class ParserWorker(object):
+    """Parses documents given as strings with a resident DiscourseParser."""
+    def __init__(self, options):
+        self.parser = DiscourseParser(options=options)
+
+    def parse(self, doc_id, text, decoding=None):
+        """
+        Returns the discourse parse of the given text as a JSON-serializable
+        dict with the keys id, tree, edus, timings, degraded, crf_calls,
+        decoding and stats.
+        """
+        timings = {}
+        status = {}
+        tree, edus = self.parser.parse_text(text, doc_id, timings, status, decoding)
+        if tree is None:
+            raise ValueError('No discourse tree could be built.')
+
+        return {'id': doc_id,
+                'tree': tree.__repr__(),
+                'edus': edus,
+                'timings': timings,
+                'degraded': status['degraded'],
+                'crf_calls': status['crf_calls'],
+                'decoding': status['decoding'],
+                'stats': self.parser.stats()}
+
+    def serve(self, input_stream, output_stream):
+        """Answers each JSON request read from input_stream on output_stream."""
+        for line in iter(input_stream.readline, ''):
+            if line.strip() == '':
+                continue
+
+            doc_id = None
+            try:
+                request = json.loads(line)
+                doc_id = request.get('id')
+                response = self.parse(doc_id, request['text'], request.get('decoding'))
+            except Exception:
+                response = {'id': doc_id, 'error': traceback.format_exc()}
+
+            output_stream.write(json.dumps(response) + '\n')
+            output_stream.flush()
+
+    def unload(self):
+        self.parser.unload()
+
+
+def main():
+    options, _ = parse_args(require_input=False)
+
+    # keep the parser's own output out of the result stream
+    protocol_stdout = sys.stdout
+    sys.stdout = sys.stderr if options.verbose else open(os.devnull, 'w')
+
+    worker = ParserWorker(options)
+    try:
+        worker.serve(sys.stdin, protocol_stdout)
+    finally:
+        worker.unload()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,15 +6,22 @@ a Docker container.
 
 In contrast to parse.py, this script only accepts one input file.
 Since parse.py is quite chatty, it's stdout will be suppressed and stored
-in a file. If the parser doesn't produce a parse, this file will
-be printed to stderr.
+in a file, which is removed when the parser is done. If the parser doesn't
+produce a parse, this file's contents will be printed to stderr.
+
+Given a directory (or a file list and the -D option) instead of a single
+file, the wrapper runs in batch mode: it loads the parser only once, writes
+one .parse file per input file and reports the files it failed to parse
+instead of aborting.
 """
 
 import os
 import sys
+import traceback
 
 from nltk.tree import ParentedTree
-from parse import parse_args
+from parse import (DiscourseParser, get_input_filenames, get_num_workers,
+                   parse_args, parse_files_in_parallel, print_degraded_files)
 from parse import main as feng_main
 
 
@@ -30,16 +37,117 @@ def get_parser_stdout(parser_stdout_filepath):
     sys.stdout = open(parser_stdout_filepath, "w")
     return stdout_str
 
+def get_parser_stdout_filepath(pid=None):
+    """
+    Returns the path of the file that the STDOUT of the parser in the
+    given process (default: this one) is re-routed to.
+    """
+    return 'parser.{}.stdout'.format(pid if pid is not None else os.getpid())
+
+def remove_parser_stdout(parser_stdout_filepath):
+    """Closes and removes the file the parser's STDOUT was re-routed to."""
+    sys.stdout.close()
+    if os.path.isfile(parser_stdout_filepath):
+        os.remove(parser_stdout_filepath)
+
 def get_output_filepath(args):
     """Returns the path to the output file of the parser."""
     input_filepath = args[0]
     input_filename = os.path.basename(input_filepath)
     return os.path.join("../texts/results", "{}.tree".format(input_filename))
 
+def get_batch_output_dir(options, args):
+    """Returns the directory the .parse files of a batch are written to."""
+    if len(args) > 1:
+        return args[1]
+    elif options.filelist:
+        return os.path.dirname(os.path.abspath(args[0]))
+    else:
+        return args[0]
+
+def parse_files(options, input_filepaths, degraded=None):
+    """
+    Parses the files with one DiscourseParser instance. Yields an
+    (index, result, error) tuple per file, error being the traceback
+    if parsing failed. If degraded is a list, the index of each file
+    whose tree building ran out of budget is appended to it.
+    """
+    parser = DiscourseParser(options=options)
+    try:
+        for (i, input_filepath) in enumerate(input_filepaths):
+            try:
+                status = {}
+                result = parser.parse(input_filepath, status)
+                if status.get('degraded') and degraded is not None:
+                    degraded.append(i)
+                yield (i, result, None)
+            except Exception:
+                yield (i, None, traceback.format_exc())
+    finally:
+        parser.unload()
+
+def batch_main(options, args):
+    """
+    Parses all files in the directory args[0] (or listed in the file args[0],
+    if the -D option is given) with one DiscourseParser instance (or one per
+    worker process, given the -w option) and writes each parse to
+    <output_dir>/<input_filename>.parse, where output_dir is args[1] or,
+    by default, the input directory.
+
+    Returns
+    -------
+    failures : list of (str, str) tuples
+        (input filepath, error message) of each file that couldn't be parsed
+    """
+    input_filepaths = get_input_filenames(options, args[0])
+    output_dir = get_batch_output_dir(options, args)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    failures = []
+    degraded = []
+    old_stdout = sys.stdout
+    parser_stdout_filepath = get_parser_stdout_filepath()
+    sys.stdout = open(parser_stdout_filepath, "w")
+    try:
+        num_workers = get_num_workers(options, len(input_filepaths))
+        if num_workers > 1:
+            outcomes = parse_files_in_parallel(
+                options, input_filepaths, num_workers,
+                stdout_fname=get_parser_stdout_filepath('%d'), degraded=degraded)
+        else:
+            outcomes = parse_files(options, input_filepaths, degraded)
+
+        for (i, result, error) in outcomes:
+            input_filepath = input_filepaths[i]
+            if error is None and not isinstance(result, ParentedTree):
+                error = "Expected a parse tree as a result, but got: {0}.".format(result)
+
+            if error is not None:
+                failures.append((input_filepath, error))
+                sys.stderr.write("Could not parse {0}:\n{1}\n".format(input_filepath, error))
+                continue
+
+            input_filename = os.path.basename(input_filepath)
+            output_filepath = os.path.join(output_dir, "{}.parse".format(input_filename))
+            with open(output_filepath, "w") as output_file:
+                output_file.write(result.__repr__() + "\n")
+    finally:
+        remove_parser_stdout(parser_stdout_filepath)
+        sys.stdout = old_stdout
+
+    sys.stdout.write("Parsed {0} of {1} files into {2}.\n".format(
+        len(input_filepaths) - len(failures), len(input_filepaths), output_dir))
+    print_degraded_files(input_filepaths, degraded)
+    return failures
+
 def main():
-    parser_stdout_filepath = 'parser.stdout'
+    parser_stdout_filepath = get_parser_stdout_filepath()
 
     options, args = parse_args()
+    if options.filelist or os.path.isdir(args[0]):
+        return batch_main(options, args)
+
     if len(args) != 1:
         sys.stderr.write("Please provide (only) one file to parse.")
         sys.exit(1)
@@ -60,7 +168,7 @@ def main():
              "Parser STDOUT was:\n{1}").format(
                 results, get_parser_stdout(parser_stdout_filepath))
     finally:
-        sys.stdout.close()
+        remove_parser_stdout(parser_stdout_filepath)
         sys.stdout = old_stdout
 
     parse_tree = results[0].__repr__() + "\n"
@@ -69,4 +177,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    result = main()
+    if isinstance(result, list) and result:
+        # some files of the batch could not be parsed
+        sys.exit(1)
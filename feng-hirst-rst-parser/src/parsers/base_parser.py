@@ -1,8 +1,41 @@
 
 from trees.parse_tree import ParseTree
 import os.path
+import time
+
+# the label of the subtrees joined once the budget has run out, i.e. the
+# most frequent relation in the RST-DT
+FALLBACK_LABEL = 'Elaboration[N][S]'
+
+
+class TreeBuildingBudget:
+    """
+    Bounds the time and/or the number of CRF sequences classified while the
+    tree of one document is built, not counting the sequences whose results
+    the classifiers had cached. Once it has run out, the parsers join
+    their remaining stumps right-branching (see BaseParser.fall_back), and
+    the tree is degraded.
+    """
+    def __init__(self, seconds = None, crf_calls = None):
+        self.deadline = time.time() + seconds if seconds is not None else None
+        self.max_crf_calls = crf_calls
+        self.crf_calls = 0
+        self.degraded = False
+    
+    def charge(self, num_sequences):
+        self.crf_calls += num_sequences
+    
+    def is_exhausted(self):
+        if self.max_crf_calls is not None and self.crf_calls >= self.max_crf_calls:
+            return True
+        
+        return self.deadline is not None and time.time() >= self.deadline
+
 
 class BaseParser:
+    # the budget of the document being parsed, if any
+    budget = None
+    
     def __init__(self, name, verbose = False, window_size = 3):
         self.name = name
         self.verbose = verbose
@@ -17,7 +50,70 @@ class BaseParser:
         self.cached_struct_features = {}
     
          
+    def out_of_budget(self):
+        if self.budget is None or not self.budget.is_exhausted():
+            return False
+        
+        self.budget.degraded = True
+        return True
+    
+    
+    def fall_back(self, representation):
+        """
+        Joins the remaining constituents of the sentence or document
+        right-branching, without classifying them, and labels the new
+        subtrees with FALLBACK_LABEL.
+        """
+        constituents = representation.constituents
+        c = constituents[-1]
+        for L in reversed(constituents[ : -1]):
+            c = L.make_new_constituent(FALLBACK_LABEL, c)
+        
+        representation.constituents = [c]
+        representation.discourse_tree = c.parse_subtree
+    
+    
     def parse_single_sequence(self, s, labeling):
+        classifier = self.get_classifier(labeling)
+        tagged = classifier.tagged
+        
+        features = self.write_sequence_features(s, labeling)
+        
+        (sequence_prob, predictions) = classifier.classify(features)
+        
+        # only the sequences the classifier didn't have cached cost a CRF call
+        if self.budget is not None:
+            self.budget.charge(classifier.tagged - tagged)
+        
+        return sequence_prob, self.get_scores(predictions, labeling)
+    
+    
+    def parse_sequences(self, sequences, labeling):
+        """
+        Like parse_single_sequence, but classifies all the given sequences
+        with one classify_many call. Returns a list of (sequence_prob, scores).
+        """
+        classifier = self.get_classifier(labeling)
+        tagged = classifier.tagged
+        
+        features = [self.write_sequence_features(s, labeling) for s in sequences]
+        
+        results = []
+        for (sequence_prob, predictions) in classifier.classify_many(features):
+            results.append((sequence_prob, self.get_scores(predictions, labeling)))
+        
+        if self.budget is not None:
+            self.budget.charge(classifier.tagged - tagged)
+        
+        return results
+    
+    
+    def write_sequence_features(self, s, labeling):
+        """
+        Returns the features of each item of the sequence s, compiled by
+        the classifier for labeling (or structure) classification.
+        """
+        classifier = self.get_classifier(labeling)
         features = []
         
         if not labeling:
@@ -56,21 +152,20 @@ class BaseParser:
                 
                 if hash_key in self.cached_struct_features:
 #                if False:
-                    inst_features_str = self.cached_struct_features[hash_key]
+                    inst_features = self.cached_struct_features[hash_key]
                 else:     
                     if self.verbose:       
                         print 'c0:', c0
                         print 'c1:', c1
                         print 'c2:', c2
                         print 'c3:', c3
-                    inst_features = self.feature_writer.write_features_for_constituents(C, positions,
-                                                                                        self.scope,
-                                                                                        labeling = False)
+                    inst_features = classifier.compile(self.feature_writer.write_features_for_constituents(C, positions,
+                                                                                                           self.scope,
+                                                                                                           labeling = False))
                     
-                    inst_features_str = '\t'.join(list(inst_features))
-                    self.cached_struct_features[hash_key] = inst_features_str
+                    self.cached_struct_features[hash_key] = inst_features
                     
-                features.append('%d\t%s' % (0, inst_features_str))
+                features.append(inst_features)
                 
         else:
             for k in range(len(s)):
@@ -128,29 +223,30 @@ class BaseParser:
                             
                     if hash_key in self.cached_mc_features:
 #                    if False:
-                        inst_features_str = self.cached_mc_features[hash_key]
+                        inst_features = self.cached_mc_features[hash_key]
                     else:
-                        inst_features = self.feature_writer.write_features_for_constituents(C, positions, 
-                                                                                            self.scope,
-                                                                                            labeling = True)
+                        inst_features = classifier.compile(self.feature_writer.write_features_for_constituents(C, positions, 
+                                                                                                               self.scope,
+                                                                                                               labeling = True))
                         
-                        inst_features_str = '\t'.join(list(inst_features))
-                        self.cached_mc_features[hash_key] = inst_features_str
+                        self.cached_mc_features[hash_key] = inst_features
                 else:
-                    inst_features_str = 'Num_EDUs=1'
+                    inst_features = classifier.compile(['Num_EDUs=1'])
         
-                features.append('%d\t%s' % (0, inst_features_str))
-#                print inst_features_str
+                features.append(inst_features)
+#                print inst_features
 
+        return features
+    
+    
+    def get_classifier(self, labeling):
         if not labeling:
-            classifier = self.bin_classifier
+            return self.bin_classifier
         else:
-            classifier = self.mc_classifier
-
-
-#        print classifier.name
-        (sequence_prob, predictions) = classifier.classify(features)
-
+            return self.mc_classifier
+    
+    
+    def get_scores(self, predictions, labeling):
         scores = []
         for i in range(len(predictions)):    
             (prediction, prob) = predictions[i]
@@ -164,7 +260,7 @@ class BaseParser:
             else:
                 scores.append(prediction)
         
-        return sequence_prob, scores
+        return scores
 
 
     def generate_crf_sequences(self, stumps, i, labeling = False):
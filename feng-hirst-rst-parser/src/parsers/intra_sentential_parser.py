@@ -1,4 +1,5 @@
 from base_parser import BaseParser
+from stump_sequence import StumpSequence
 from trees.parse_tree import ParseTree
 import utils.utils
 import random
@@ -6,10 +7,11 @@ import os.path
 import paths
 
 class IntraSententialParser(BaseParser):
-    def __init__(self, name = 'IntraParser', verbose = False, window_size = 3):
+    def __init__(self, name = 'IntraParser', verbose = False, window_size = 3, incremental = False):
         BaseParser.__init__(self, name, verbose, window_size)
         
         self.scope = True
+        self.incremental = incremental
 #        signature = random.getrandbits(24)
 #        self.tmp_test_fname = os.path.join(paths.TMP_PATH, 'tmp_intra_struct_crf_test_%s.txt' % signature)
         
@@ -29,10 +31,19 @@ class IntraSententialParser(BaseParser):
             sentence.discourse_tree = sentence.constituents[0]
             return
         
+        if self.incremental:
+            return self.parse_sequence_incremental(sentence)
+        
+        if self.out_of_budget():
+            return self.fall_back(sentence)
+        
         sentence.constituents_scores = self.parse_single_sequence(sentence.constituents, 
                                                                   labeling = False)[1]
                                                                   
         while len(sentence.constituents) > 1:
+            if self.out_of_budget():
+                return self.fall_back(sentence)
+            
             best_one = None
             max_bin_score = -20.0
             
@@ -76,6 +87,101 @@ class IntraSententialParser(BaseParser):
         if self.verbose:
             print sentence.discourse_tree
 
+    def parse_sequence_incremental(self, sentence):
+        """
+        An approximation of parse_sequence, used only if the parser is
+        incremental: after each merge only the pairs whose features have
+        changed are rescored, and only the new constituent is labeled, each
+        in a CRF sequence around the new constituent. That is a constant
+        number of short sequences per merge instead of two sequences over
+        the whole sentence.
+        
+        It is not equivalent to parse_sequence. The CRF's scores and labels
+        depend on the whole sequence, not only on the features of a pair or
+        constituent, so the scores of a short sequence differ from those of
+        the whole sentence. And parse_sequence labels each subtree in the
+        last labeling pass over the whole sentence before the subtree is
+        merged, so it can't be replaced by one pass over the final tree
+        either. The trees can therefore differ from parse_sequence's.
+        """
+        if self.out_of_budget():
+            return self.fall_back(sentence)
+        
+        stumps = StumpSequence(sentence.constituents)
+        bin_scores = self.parse_single_sequence(sentence.constituents, labeling = False)[1]
+        for (node, bin_score) in zip(stumps.get_nodes(), bin_scores):
+            stumps.set_score(node, bin_score)
+        
+        while len(stumps) > 1:
+            if self.out_of_budget():
+                sentence.constituents = stumps.get_constituents()
+                return self.fall_back(sentence)
+            
+            best_one = stumps.pop_best()
+            
+            L = best_one.constituent
+            R = best_one.next.constituent
+            new_constituent = L.make_new_constituent('n/a', R)
+            stumps.merge(best_one, new_constituent)
+            
+            if len(stumps) > 1:
+                self.rescore_pairs(stumps, best_one)
+            
+            self.label_constituent(stumps, best_one)
+        
+        sentence.constituents = stumps.get_constituents()
+        sentence.constituents_scores = []
+        sentence.discourse_tree = sentence.constituents[0].parse_subtree
+        if self.verbose:
+            print sentence.discourse_tree
+    
+    
+    def rescore_pairs(self, stumps, node):
+        """
+        Rescores the pairs of constituents whose features depend on the new
+        constituent in node, i.e. the pairs i - 2 to i + 1 if it's the i-th.
+        """
+        (nodes, i) = stumps.get_window(node, 3, 3)
+        constituents = [n.constituent for n in nodes]
+        first = max(0, i - 2)
+        last = min(len(constituents) - 2, i + 1)
+        
+        # the features of pair k are those of the constituents k - 1 to k + 2,
+        # so with one more constituent on each side, the rescored pairs have
+        # the same features as in the whole sequence, though not the same
+        # context, so their scores can differ
+        start = max(0, first - 1)
+        end = min(len(constituents), last + 3)
+        scores = self.parse_single_sequence(constituents[start : end], labeling = False)[1]
+        
+        for k in range(first, last + 1):
+            stumps.set_score(nodes[k], scores[k - start])
+    
+    
+    def label_constituent(self, stumps, node):
+        """
+        Labels the new constituent in node, with its neighbours as context,
+        which its labeling features are those of. The label can differ from
+        the one labeling the whole sequence would predict.
+        """
+        (nodes, i) = stumps.get_window(node, 1, 1)
+        constituents = [n.constituent for n in nodes]
+        start = max(0, i - 1)
+        
+        seq_prob, mc_predictions = self.parse_single_sequence(constituents[start : i + 2], 
+                                                              labeling = True)
+        predicted_label = mc_predictions[i - start]
+        
+        c = constituents[i]
+        c.parse_subtree.set_label(predicted_label)
+        if self.verbose:
+            print 'Labeling'
+            print 'L', c.left_child
+            print 'R', c.right_child
+            print 'with predicted label', predicted_label
+            print
+    
+    
     def relabel_stumps(self, stumps):
         seq_prob, mc_predictions = self.parse_single_sequence(stumps, labeling = True)
             
@@ -1,11 +1,16 @@
 
 from base_parser import BaseParser
+from stump_sequence import StumpSequence
 from trees.parse_tree import ParseTree
 import utils.utils
 import random
 import os.path
 import paths
 
+# the number of pairs of stumps scored in one batch before the budget is
+# checked again, while all the pairs are scored at the start
+SCORING_BATCH_SIZE = 8
+
 class MultiSententialParser(BaseParser):
     def __init__(self, name = 'MultiParser', verbose = False, window_size = 3):
         BaseParser.__init__(self, name, verbose, window_size)
@@ -24,11 +29,14 @@ class MultiSententialParser(BaseParser):
         print 'Added classifier', name, 'to treebuilder', self.name
     
     
-    def parse_document(self, doc):
+    def parse_document(self, doc, shift_reduce = False):
         self.clear_cache()
         
         doc.prepare_parsing()
         
+        if shift_reduce:
+            return self.parse_sequence_shift_reduce(doc)
+        
         return self.parse_sequence(doc)
         
         
@@ -37,61 +45,151 @@ class MultiSententialParser(BaseParser):
             doc.discourse_tree = doc.constituents[0].parse_subtree
             return
         
-        for i in range(len(doc.constituents) - 1):
+#        for i in range(len(doc.constituents) - 1):
 #            print 'constituent', i, doc.constituents[i]
 #            print doc.constituents[i].parse_subtree
 #            print
-            bin_score = self.classify_pair(doc, i)
-            doc.constituent_scores.append(bin_score)
+        num_pairs = len(doc.constituents) - 1
+        bin_scores = []
+        for start in range(0, num_pairs, SCORING_BATCH_SIZE):
+            if self.out_of_budget():
+                return self.fall_back(doc)
+            
+            positions = range(start, min(start + SCORING_BATCH_SIZE, num_pairs))
+            bin_scores.extend(self.classify_pairs(doc.constituents, positions))
+        
+        stumps = StumpSequence(doc.constituents)
+        for (node, bin_score) in zip(stumps.get_nodes(), bin_scores):
+            stumps.set_score(node, bin_score)
         
         seq_prob = None
-        while len(doc.constituents) > 1:
-            best_one = None
-            max_bin_score = -20.0
-            for (index, bin_score) in enumerate(doc.constituent_scores):
-                if bin_score > max_bin_score:
-                    best_one = index
-                    max_bin_score = bin_score
+        while len(stumps) > 1:
+            if self.out_of_budget():
+                doc.constituents = stumps.get_constituents()
+                return self.fall_back(doc)
             
+            best_one = stumps.pop_best()
             
-            seq_prob = self.connect_stumps(best_one, doc)
+            seq_prob = self.connect_stumps(best_one, stumps)
         
+        doc.constituents = stumps.get_constituents()
         doc.discourse_tree = doc.constituents[0].parse_subtree
 #        print doc.discourse_tree
 
 
-    def classify_pair(self, doc, i):
-        max_prob = -20
-        max_prob_sequence = None
-        max_prob_predictions = None
-        
-        for (s, j) in self.generate_crf_sequences(doc.constituents, i, labeling = False):
-#            print 's', s
-            (sequence_prob, predictions) = self.parse_single_sequence(s, labeling = False)
+    def parse_sequence_shift_reduce(self, doc):
+        """
+        Builds the tree in one left-to-right pass instead of greedily: the
+        stumps are shifted onto a stack, and the top two stumps on the stack
+        are merged (reduced) as long as their structure score is at least
+        that of the top stump and the next one in the input. Each step
+        classifies one sequence of at most five stumps, and each merge labels
+        the new stump in one sequence of at most three, so the number of CRF
+        calls is linear in the number of stumps.
+        """
+        stack = []
+        stumps = doc.constituents
+        i = 0
+        while i < len(stumps) or len(stack) > 1:
+            if self.out_of_budget():
+                doc.constituents = stack + stumps[i : ]
+                return self.fall_back(doc)
             
-            if sequence_prob > max_prob:
-                max_prob = sequence_prob
-                max_prob_sequence = (s, j)
-                max_prob_predictions = predictions
+            if len(stack) < 2:
+                stack.append(stumps[i])
+                i += 1
+                continue
+            
+            if i < len(stumps):
+                # the pairs (stack[-2], stack[-1]) and (stack[-1], stumps[i]),
+                # with their neighbours as context
+                s = stack[-3 : ] + stumps[i : i + 2]
+                k = len(stack[-3 : ]) - 2
+                bin_scores = self.parse_single_sequence(s, labeling = False)[1]
                 
-#            if self.verbose:
-#                print sequence_prob
-#                for pred in predictions:
-#                    print pred
-#                print
+                if bin_scores[k] < bin_scores[k + 1]:
+                    stack.append(stumps[i])
+                    i += 1
+                    continue
+            
+            self.reduce_stumps(stack, stumps[i : i + 1])
+        
+        doc.constituents = stack
+        doc.discourse_tree = doc.constituents[0].parse_subtree
     
-        (s_star, j_star) = max_prob_sequence
-        struct_prob =  max_prob_predictions[j_star]
-        return struct_prob
+    
+    def reduce_stumps(self, stack, next_stumps):
+        """
+        Merges the top two stumps on the stack and labels the new one, with
+        the stump below it and the next one in the input (if any) as context.
+        """
+        R = stack.pop()
+        L = stack.pop()
+        new_constituent = L.make_new_constituent('n/a', R)
+        
+        s = stack[-1 : ] + [new_constituent] + next_stumps
+        mc_predictions = self.parse_single_sequence(s, labeling = True)[1]
+        predicted_label = mc_predictions[len(stack[-1 : ])]
+        new_constituent.parse_subtree.set_label(predicted_label)
+        
+        if self.verbose:
+            print 'Reducing'
+            print 'L', L
+            print 'R', R
+            print 'with predicted label', predicted_label
+            print
+        
+        stack.append(new_constituent)
+    
+    
+    def classify_pair(self, stumps, i):
+        return self.classify_pairs(stumps, [i])[0]
+    
+    
+    def classify_pairs(self, stumps, positions):
+        """
+        Returns the structure score of each of the given positions, i.e. of
+        merging stumps i and i + 1. The candidate windows of all the
+        positions are classified in one batch.
+        """
+        windows = [self.generate_crf_sequences(stumps, i, labeling = False) for i in positions]
+        results = self.parse_sequences([s for S in windows for (s, j) in S], labeling = False)
+        
+        struct_probs = []
+        offset = 0
+        for S in windows:
+            max_prob = -20
+            max_prob_sequence = None
+            max_prob_predictions = None
+            
+            for ((s, j), (sequence_prob, predictions)) in zip(S, results[offset : offset + len(S)]):
+#                print 's', s
+                if sequence_prob > max_prob:
+                    max_prob = sequence_prob
+                    max_prob_sequence = (s, j)
+                    max_prob_predictions = predictions
+                    
+#                if self.verbose:
+#                    print sequence_prob
+#                    for pred in predictions:
+#                        print pred
+#                    print
+            
+            offset += len(S)
+            
+            (s_star, j_star) = max_prob_sequence
+            struct_probs.append(max_prob_predictions[j_star])
+        
+        return struct_probs
     
     
-    def relabel_stumps(self, doc, i):
+    def relabel_stumps(self, stumps, i):
         max_prob = -20
         max_prob_sequence = None
         max_prob_predictions = None
         
-        for (s, j) in self.generate_crf_sequences(doc.constituents, i, labeling = True):
-            (prob, predictions) = self.parse_single_sequence(s, labeling = True)
+        S = self.generate_crf_sequences(stumps, i, labeling = True)
+        for ((s, j), (prob, predictions)) in zip(S, self.parse_sequences([s for (s, j) in S], labeling = True)):
             if prob > max_prob:
                 max_prob = prob
                 max_prob_sequence = (s, j)
@@ -124,38 +222,40 @@ class MultiSententialParser(BaseParser):
     
     
     
-    def connect_stumps(self, i, doc):
+    def connect_stumps(self, node, stumps):
 #        print stumps
         #print stumps_mc_scores[i]
         
+        L = node.constituent
+        R = node.next.constituent
+        
         if self.verbose:
-            print 'Connecting stumps[%d] and stumps[%d]' % (i, i + 1)
-            print 'stumps[%d]' % i, doc.constituents[i]
+            print 'Connecting stumps'
+            print 'L', L
             print
-            print 'stumps[%d]' % (i + 1), doc.constituents[i + 1]
+            print 'R', R
             
-        L = doc.constituents[i]
-        R = doc.constituents[i + 1]
         new_constituent = L.make_new_constituent('n/a', R)
-        doc.constituents[i:i+2] = [new_constituent]
+        stumps.merge(node, new_constituent)
         
-        (seq_prob, start, s_len) = self.relabel_stumps(doc, i)
-#        (seq_prob, start, s_len) = self.relabel_stumps(stumps, offsets, i, prev_tree, tree_offset)
+        # relabeling and rescoring only look at the stumps within this many
+        # stumps of the new one, see generate_crf_sequences
+        reach = 3 * self.window_size
+        (nodes, i) = stumps.get_window(node, reach, reach)
+        window = [n.constituent for n in nodes]
         
-#        print 'scores', len(doc.constituent_scores)
-        for k in range(max(0, start - (self.window_size - 1)/2 - 1), i):
-            bin_score = self.classify_pair(doc, k)
-            
-#            print 'k', k, len(doc.constituent_scores)
-            doc.constituent_scores[k] = bin_score
+        (seq_prob, start, s_len) = self.relabel_stumps(window, i)
+#        (seq_prob, start, s_len) = self.relabel_stumps(stumps, offsets, i, prev_tree, tree_offset)
         
-        for k in range(i + 2, min(len(doc.constituents) - 1, i + 2 + (self.window_size - 1)/2 + s_len)):
-            bin_score = self.classify_pair(doc, k - 1)
-            
-#            print 'k', k, len(doc.constituent_scores)
-            doc.constituent_scores[k] = bin_score
+        # rescore the pairs on both sides of the new constituent in one batch;
+        # the pair of the new constituent and the next one keeps the score of
+        # the pair of R and the next one
+        left = range(max(0, start - (self.window_size - 1)/2 - 1), i)
+        right = range(i + 1, min(len(window) - 2, i + 1 + (self.window_size - 1)/2 + s_len))
+        bin_scores = self.classify_pairs(window, left + right)
         
-        doc.constituent_scores[i : i + 1] = []
+        for (k, bin_score) in zip(left + right, bin_scores):
+            stumps.set_score(nodes[k], bin_score)
 #        print
     
         return seq_prob
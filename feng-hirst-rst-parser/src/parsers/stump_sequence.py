@@ -0,0 +1,115 @@
+"""
+The sequence of stumps (constituents) that the greedy parsers merge into a
+tree, as a doubly linked list, with the structure score of each pair of
+neighbouring stumps in a priority queue.
+
+Finding the best pair and merging it costs O(log n) instead of the O(n) of
+scanning the list of scores and splicing the lists of constituents and
+scores. A score that has been replaced (or whose pair has been merged)
+stays in the queue until it comes up, and is skipped then.
+"""
+
+import heapq
+import itertools
+
+
+class StumpNode:
+    def __init__(self, constituent):
+        self.constituent = constituent
+        self.prev = None
+        self.next = None
+        # the score of the pair of this stump and the next one, and the id
+        # of its entry in the queue
+        self.score = None
+        self.entry_id = None
+
+
+class StumpSequence:
+    def __init__(self, constituents):
+        self.first = None
+        self.length = 0
+        self.queue = []
+        self.entry_ids = itertools.count()
+
+        last = None
+        for c in constituents:
+            node = StumpNode(c)
+            if last is None:
+                self.first = node
+            else:
+                last.next = node
+                node.prev = last
+            last = node
+            self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def get_nodes(self):
+        nodes = []
+        node = self.first
+        while node is not None:
+            nodes.append(node)
+            node = node.next
+        return nodes
+
+    def get_constituents(self):
+        return [node.constituent for node in self.get_nodes()]
+
+    def set_score(self, node, score):
+        """Sets the score of the pair of node and the next stump."""
+        node.score = score
+        node.entry_id = self.entry_ids.next()
+        # of the pairs with the best score, the leftmost one is merged first
+        heapq.heappush(self.queue, (-score, node.constituent.l_start, node.entry_id, node))
+
+    def pop_best(self):
+        """
+        Returns the node of the best pair, i.e. the first stump of the pair
+        with the highest score, the leftmost one of those, like scanning
+        the scores does.
+        """
+        while self.queue:
+            (score, l_start, entry_id, node) = heapq.heappop(self.queue)
+            if entry_id == node.entry_id and node.next is not None:
+                return node
+
+    def merge(self, node, new_constituent):
+        """
+        Replaces the stumps node and node.next with new_constituent, in node.
+        The new stump keeps the score of the right stump's pair until it's
+        rescored, like splicing the list of scores does.
+        """
+        right = node.next
+        node.constituent = new_constituent
+        node.next = right.next
+        if right.next is not None:
+            right.next.prev = node
+        right.entry_id = None
+        self.length -= 1
+
+        if right.score is not None and node.next is not None:
+            self.set_score(node, right.score)
+        else:
+            node.score = None
+            node.entry_id = None
+
+    def get_window(self, node, before, after):
+        """
+        Returns the nodes from up to before stumps left of node to up to
+        after stumps right of it, and the index of node among them.
+        """
+        nodes = [node]
+        left = node.prev
+        while left is not None and len(nodes) <= before:
+            nodes.append(left)
+            left = left.prev
+        nodes.reverse()
+        i = len(nodes) - 1
+
+        right = node.next
+        while right is not None and len(nodes) - i <= after:
+            nodes.append(right)
+            right = right.next
+
+        return nodes, i
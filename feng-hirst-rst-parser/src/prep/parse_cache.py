@@ -0,0 +1,204 @@
+"""
+Persistent cache of the Stanford parser's output, i.e. the penn parse and
+the dependencies of each sentence.
+
+The cache is a directory with one file per sentence, named by a hash of
+the normalized sentence and the parser version, so that several workers
+(and several runs) can share it without any locking: entries are written
+to a temporary file first and then renamed, so a reader either finds a
+complete entry or none. When the cache grows beyond its size limit, the
+least recently used entries are deleted.
+
+The size of the cache isn't kept anywhere, as that would take a lock. Each
+worker adds up the sizes of the entries only after it has written another
+SIZE_CHECK_INTERVAL of the maximum size, rather than whenever it starts,
+so that the cost of walking the cache is spread over many writes. With n
+workers, the cache can grow to about max_size * (1 + n * SIZE_CHECK_INTERVAL)
+before it's evicted.
+"""
+
+import hashlib
+import os
+import os.path
+import tempfile
+
+import paths
+
+# the parser (and models) whose output is cached: parses of another version
+# of the parser are never used
+PARSER_VERSION = os.path.basename(os.path.normpath(paths.STANFORD_PARSER_PATH))
+
+# default maximum size of the cache in MB
+DEFAULT_CACHE_SIZE = 1024
+
+# after an eviction, the cache is this fraction of its maximum size
+EVICTION_TARGET = 0.9
+
+# each worker checks the size of the cache after it has written this
+# fraction of its maximum size
+SIZE_CHECK_INTERVAL = 0.05
+
+# the mode of the entries, readable by the workers of other users, unlike
+# the temporary files they are written to
+ENTRY_MODE = 0644
+
+
+def normalize_sentence(s):
+    """Returns the sentence as the parser sees it, i.e. up to whitespace."""
+    return ' '.join(s.split())
+
+
+class ParseCache:
+    def __init__(self, cache_dir, max_size = DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # the number of bytes written since the size was last checked
+        self.unchecked_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_path(self, s):
+        key = hashlib.sha1('%s\n%s' % (PARSER_VERSION, normalize_sentence(s))).hexdigest()
+        return os.path.join(self.cache_dir, key[ : 2], key)
+
+    def get_entries(self):
+        """Returns the (mtime, size, path) of each complete entry."""
+        entries = []
+        for subdir in os.listdir(self.cache_dir):
+            subdir = os.path.join(self.cache_dir, subdir)
+            if not os.path.isdir(subdir):
+                continue
+
+            for fname in os.listdir(subdir):
+                if fname.startswith('.'):
+                    # an entry that is being written
+                    continue
+
+                path = os.path.join(subdir, fname)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # evicted by another worker in the meantime
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        return entries
+
+    def get(self, s):
+        """
+        Returns the cached (penn parse, dependencies) tuple of the sentence,
+        or None.
+        """
+        path = self.get_path(s)
+        try:
+            with open(path) as entry:
+                data = entry.read()
+        except IOError:
+            self.misses += 1
+            return None
+
+        try:
+            # the entry is used now, so it's evicted last
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self.hits += 1
+        (penn_parse, deps) = data.split('\n', 1)
+        return (penn_parse, deps)
+
+    def put(self, s, result):
+        (penn_parse, deps) = result
+        data = '%s\n%s' % (penn_parse, deps)
+
+        path = self.get_path(s)
+        subdir = os.path.dirname(path)
+        if not os.path.exists(subdir):
+            try:
+                os.makedirs(subdir)
+            except OSError:
+                # created by another worker in the meantime
+                pass
+
+        fd, tmp_path = tempfile.mkstemp(dir = subdir, prefix = '.')
+        try:
+            with os.fdopen(fd, 'w') as entry:
+                entry.write(data)
+            os.chmod(tmp_path, ENTRY_MODE)
+            os.rename(tmp_path, path)
+        except:
+            os.remove(tmp_path)
+            raise
+
+        self.unchecked_size += len(data)
+        if self.unchecked_size >= self.max_size * SIZE_CHECK_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries if the cache is larger than
+        its maximum size, until it's EVICTION_TARGET of it.
+        """
+        self.unchecked_size = 0
+        entries = self.get_entries()
+        # other workers add entries too, so start from the actual size
+        size = sum(entry_size for (mtime, entry_size, path) in entries)
+        if size <= self.max_size:
+            return
+
+        for (mtime, entry_size, path) in sorted(entries):
+            if size <= self.max_size * EVICTION_TARGET:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                # evicted by another worker in the meantime
+                pass
+            size -= entry_size
+
+
+class CachedSyntaxParser:
+    """
+    A SyntaxParser (or SyntaxParserPool) that only parses the sentences
+    which aren't in its ParseCache yet.
+    """
+    def __init__(self, syntax_parser, cache):
+        self.syntax_parser = syntax_parser
+        self.cache = cache
+
+    def share(self):
+        self.syntax_parser.share()
+
+    def parse_sentence(self, s):
+        return self.parse_sentences([s])[0]
+
+    def parse_sentences(self, sentences):
+        results = [self.cache.get(s) for s in sentences]
+
+        missing = [i for (i, result) in enumerate(results) if result is None]
+        if missing:
+            for (i, result) in zip(missing, self.syntax_parser.parse_sentences([sentences[i] for i in missing])):
+                self.cache.put(sentences[i], result)
+                results[i] = result
+
+        return results
+
+    def stats(self):
+        """
+        Returns the stats of the syntax parser, and the numbers of hits and
+        misses of the cache.
+        """
+        stats = dict(self.syntax_parser.stats())
+        stats['parse_cache'] = {'hits': self.cache.hits, 'misses': self.cache.misses}
+        return stats
+
+    def poll(self):
+        return self.syntax_parser.poll()
+
+    def unload(self):
+        print 'Parse cache: %d hits, %d misses' % (self.cache.hits, self.cache.misses)
+        self.syntax_parser.unload()
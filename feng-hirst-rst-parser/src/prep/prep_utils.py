@@ -1,6 +1,14 @@
 from trees.lexicalized_tree import LexicalizedTree
 import re
 
+# the leaves of the penn parses printed by the Stanford parser
+LEAF_PATTERN = '(?<=\\s)[^\)\(]+'
+
+# the tokens of a penn parse, as read by LexicalizedTree.fromstring with
+# leaf_pattern = LEAF_PATTERN: an opening bracket with its label, a closing
+# bracket or a leaf
+PENN_TOKEN_RE = re.compile('\\(\\s*([^\\s\\(\\)]+)?|\\)|(%s)' % LEAF_PATTERN)
+
 def replace_words(text, word_dic):
     """
     take a text and <strong class="highlight">replace</strong> <strong class="highlight">words</strong> that match a key in a dictionary with
@@ -31,3 +39,106 @@ def create_lexicalized_tree(unlexicalized_tree, heads):
     t.lexicalize(heads)
         
     return t
+
+
+
+def read_parse(parse_tree_str, governors):
+    """
+    Reads a penn parse printed by the Stanford parser in a single pass.
+    
+    Returns the tree, exactly as LexicalizedTree.fromstring(parse_tree_str,
+    leaf_pattern = LEAF_PATTERN) reads it, a lexicalized copy of the tree,
+    as create_lexicalized_tree makes it given the governor id of each token
+    (governors maps token ids to governor ids, 0 by default), and the
+    leaves of the tree and their PoS tags.
+    
+    The lexicalized tree is None if the parse isn't in the usual form, e.g.
+    if it contains null elements, which create_lexicalized_tree removes
+    first. The tree is None if the parse can't be read in a single pass;
+    LexicalizedTree.fromstring reports the error then.
+    """
+    leaves = []
+    tags = []
+    lexicalizable = True
+    
+    # the label, the children and the lexicalized children of each open node
+    stack = [(None, [], [])]
+    for match in PENN_TOKEN_RE.finditer(parse_tree_str):
+        token = match.group()
+        if token[0] == '(':
+            if len(stack) == 1 and stack[0][1]:
+                # a second tree
+                return None, None, None, None
+            
+            label = token[1 : ].lstrip()
+            if label == '-NONE-':
+                lexicalizable = False
+            stack.append((label, [], []))
+        
+        elif token == ')':
+            if len(stack) == 1:
+                return None, None, None, None
+            
+            (label, children, lexicalized_children) = stack.pop()
+            node = LexicalizedTree(label, children)
+            stack[-1][1].append(node)
+            
+            if not lexicalizable:
+                continue
+            
+            if not children:
+                lexicalizable = False
+                continue
+            
+            if not isinstance(children[0], LexicalizedTree):
+                # a preterminal (see LexicalizedTree.lexicalize): the head is
+                # its last leaf
+                if len(children) > 1 or ' ' in children[0]:
+                    lexicalizable = False
+                    continue
+                
+                lexicalized_node = LexicalizedTree(label, children[:])
+                lexicalized_node.head = len(leaves) - 1
+                lexicalized_node.head_sup = governors.get(len(leaves), 0) - 1
+            else:
+                if None in lexicalized_children:
+                    # a leaf next to a subtree
+                    lexicalizable = False
+                    continue
+                
+                # see LexicalizedTree._lexicalize
+                lexicalized_node = LexicalizedTree(label, lexicalized_children)
+                heads = [child.head for child in lexicalized_children]
+                head_sups = [child.head_sup for child in lexicalized_children]
+                lexicalized_node.head = heads[0]
+                lexicalized_node.head_sup = head_sups[0]
+                if len(heads) > 1:
+                    for head_sup in head_sups:
+                        if head_sup in heads:
+                            lexicalized_node.head = head_sup
+                            lexicalized_node.head_sup = head_sups[heads.index(head_sup)]
+            
+            stack[-1][2].append(lexicalized_node)
+        
+        else:
+            if len(stack) == 1:
+                return None, None, None, None
+            
+            (label, children, lexicalized_children) = stack[-1]
+            children.append(token)
+            # a placeholder, so that leaves next to subtrees are noticed
+            lexicalized_children.append(None)
+            leaves.append(token)
+            tags.append(label)
+    
+    if len(stack) > 1 or not stack[0][1]:
+        return None, None, None, None
+    
+    tree = stack[0][1][0]
+    if not lexicalizable:
+        return tree, None, leaves, tags
+    
+    lexicalized_tree = stack[0][2][0]
+    lexicalized_tree.offset = 0
+    lexicalized_tree.index_leaves()
+    return tree, lexicalized_tree, leaves, tags
@@ -3,26 +3,38 @@ Created on 2014-01-18
 
 @author: Wei
 '''
-import subprocess
 import paths
 from document.sentence import Sentence
 from document.token import Token
 from trees.lexicalized_tree import LexicalizedTree
 import prep_utils
 import os.path
-from syntax_parser import SyntaxParser
+from syntax_parser import SyntaxParser, SyntaxParserPool
+from parse_cache import ParseCache, CachedSyntaxParser, DEFAULT_CACHE_SIZE
+from sentence_splitter import SentenceSplitter
 from document.dependency import Dependency
 import re
 
+# a dependency as printed by the Stanford parser, e.g. nsubj(accepted-8, they-7)
+DEPENDENCY_RE = re.compile('(.+?)\((.+?)-(\d+?), (.+?)-(\d+?)\)')
+
 class Preprocesser:
-    def __init__(self):        
+    def __init__(self, syntax_parsers = 1, parse_cache_dir = None, parse_cache_size = DEFAULT_CACHE_SIZE):        
         self.syntax_parser = None
         
         try:
-            self.syntax_parser = SyntaxParser()
+            if syntax_parsers > 1:
+                self.syntax_parser = SyntaxParserPool(syntax_parsers)
+            else:
+                self.syntax_parser = SyntaxParser()
         except Exception, e:
             raise e
         
+        if parse_cache_dir:
+            self.syntax_parser = CachedSyntaxParser(self.syntax_parser, ParseCache(parse_cache_dir, parse_cache_size))
+        
+        self.sentence_splitter = SentenceSplitter()
+        
         self.max_sentence_len = 100
     
     def heuristic_sentence_splitting(self, raw_sent):
@@ -74,80 +86,122 @@ class Preprocesser:
     
     
     def process_single_sentence(self, doc, raw_text, end_of_para):
-        sentence = Sentence(len(doc.sentences), raw_text + ('<s>' if not end_of_para else '<P>'), doc)
         parse_tree_str, deps_str = self.parse_single_sentence(raw_text)
+        self.add_parsed_sentence(doc, raw_text, end_of_para, parse_tree_str, deps_str)
+    
+    
+    def add_parsed_sentence(self, doc, raw_text, end_of_para, parse_tree_str, deps_str):
+        sentence = Sentence(len(doc.sentences), raw_text + ('<s>' if not end_of_para else '<P>'), doc)
 
-        parse = LexicalizedTree.fromstring(parse_tree_str, leaf_pattern = '(?<=\\s)[^\)\(]+')  
+        # the dependencies are read first, so that the parse can be read and
+        # lexicalized in a single pass
+        dependencies = self.read_dependencies(deps_str.split('\n'))
+        governors = dict((dep.dependent, dep.governor) for dep in dependencies)
+        
+        (parse, lexicalized_parse, words, tags) = prep_utils.read_parse(parse_tree_str, governors)
+        if parse is None:
+            parse = LexicalizedTree.fromstring(parse_tree_str, leaf_pattern = prep_utils.LEAF_PATTERN)
+            words = parse.leaves()
+            tags = [parse[parse.leaf_treeposition(i)[ : -1]].label() for i in range(len(words))]
         sentence.set_unlexicalized_tree(parse)
         
-        for (token_id, te) in enumerate(parse.leaves()):
-            word = te
+        for (token_id, (word, tag)) in enumerate(zip(words, tags)):
             token = Token(word, token_id + 1, sentence)
+            token.pos = tag
             sentence.add_token(token)
 
-        heads = self.get_heads(sentence, deps_str.split('\n'))
+        heads = self.get_heads(sentence, dependencies)
         sentence.heads = heads
-        sentence.set_lexicalized_tree(prep_utils.create_lexicalized_tree(parse, heads))
+        
+        if lexicalized_parse is None or any(head[2] != governors.get(i + 1, 0) for (i, head) in enumerate(heads)):
+            lexicalized_parse = prep_utils.create_lexicalized_tree(parse, heads)
+        sentence.set_lexicalized_tree(lexicalized_parse)
+        sentence.build_token_table()
      
         doc.add_sentence(sentence)
     
     
-    def get_heads(self, sentence, dep_elems):
-        heads = []
-        for token in sentence.tokens:
-            heads.append([token.word, token.get_PoS_tag(), 0])
-            
+    def read_dependencies(self, dep_elems):
+        dependencies = []
         for dep_e in dep_elems:
-            m = re.match('(.+?)\((.+?)-(\d+?), (.+?)-(\d+?)\)', dep_e)
+            m = DEPENDENCY_RE.match(dep_e)
             if m:
                 relation = m.group(1)
                 gov_id = int(m.group(3))
                 dep_id = int(m.group(5))
-
-                heads[dep_id - 1][2] = gov_id
-                sentence.add_dependency(Dependency(gov_id, dep_id, relation))
-
+                
+                dependencies.append(Dependency(gov_id, dep_id, relation))
+        
+        return dependencies
+    
+    
+    def get_heads(self, sentence, dependencies):
+        heads = []
+        for token in sentence.tokens:
+            heads.append([token.word, token.get_PoS_tag(), 0])
             
+        for dep in dependencies:
+            heads[dep.dependent - 1][2] = dep.governor
+            sentence.add_dependency(dep)
+
         return heads
 
 
     def sentence_splitting(self, raw_filename, doc):
+        with open(raw_filename) as raw_file:
+            self.text_sentence_splitting(raw_file.read(), doc)
+    
+    
+    def text_sentence_splitting(self, text, doc):
         doc.sentences = []
         
-        cmd = 'perl %s/boundary.pl -d %s/HONORIFICS -i %s' % (paths.SSPLITTER_PATH, paths.SSPLITTER_PATH, os.path.abspath(raw_filename))
+        # one sentence per line and an empty line after each paragraph, as
+        # printed by boundary.pl
+        output = self.sentence_splitter.split(text)
 
-        p = subprocess.Popen(cmd, stdout = subprocess.PIPE, stderr = subprocess.PIPE, shell = True)
-        output, errdata = p.communicate()
-
-        if len(errdata) == 0:
-            raw_paras = output.strip().split('\n\n')
-            seg_sents = []
-            for raw_string in raw_paras:
-                raw_sentences = raw_string.split('\n')
-                for (i, raw_sent) in enumerate(raw_sentences):
-                    if len(raw_sent.split()) > self.max_sentence_len:
-                        chunked_raw_sents = self.heuristic_sentence_splitting(raw_sent)
-                        if len(chunked_raw_sents) == 1:
-                            continue
-                        
-                        for (j, sent) in enumerate(chunked_raw_sents):
-                            seg_sents.append((sent, i == len(raw_sentences) - 1 and j == len(chunked_raw_sents)))
-                    else:
-                        seg_sents.append((raw_sent, i == len(raw_sentences) - 1))
-        else:
-            raise NameError("*** Sentence splitter crashed, with trace %s..." % errdata)
-        
-        
-        for (i, (raw_text, end_of_para)) in enumerate(seg_sents):
+        raw_paras = output.strip().split('\n\n')
+        seg_sents = []
+        for raw_string in raw_paras:
+            raw_sentences = raw_string.split('\n')
+            for (i, raw_sent) in enumerate(raw_sentences):
+                if raw_sent == '':
+                    # left over from several empty lines in a row
+                    continue
+                
+                if len(raw_sent.split()) > self.max_sentence_len:
+                    chunked_raw_sents = self.heuristic_sentence_splitting(raw_sent)
+                    if len(chunked_raw_sents) == 1:
+                        continue
+                    
+                    for (j, sent) in enumerate(chunked_raw_sents):
+                        seg_sents.append((sent, i == len(raw_sentences) - 1 and j == len(chunked_raw_sents)))
+                else:
+                    seg_sents.append((raw_sent, i == len(raw_sentences) - 1))
+        
+        
+        # the sentences are independent of each other, so they are all sent
+        # to the syntax parser at once
+        parses = self.syntax_parser.parse_sentences([raw_text for (raw_text, end_of_para) in seg_sents])
+        
+        for (i, ((raw_text, end_of_para), (parse_tree_str, deps_str))) in enumerate(zip(seg_sents, parses)):
             if i % 10 == 0:
                 print 'Processing sentence %d out of %d' % (i, len(seg_sents))
     
-            self.process_single_sentence(doc, raw_text, end_of_para)
+            self.add_parsed_sentence(doc, raw_text, end_of_para, parse_tree_str, deps_str)
                 
 
     def preprocess(self, raw_filename, doc):
         self.sentence_splitting(raw_filename, doc)
         
+    
+    def preprocess_text(self, text, doc):
+        self.text_sentence_splitting(text, doc)
+        
+
+    def share(self):
+        if self.syntax_parser:
+            self.syntax_parser.share()
+
 
     def unload(self):
         if self.syntax_parser:
@@ -0,0 +1,216 @@
+"""
+Python port of the CCG sentence splitter (tools/CCGSsplitter/boundary.pl,
+by Marcia Munoz and Ramya Nagarajan), which splits a text in memory
+instead of running perl on a file.
+
+Given the same honorifics, SentenceSplitter.split returns exactly what
+boundary.pl prints for a non-empty text: one sentence per line, and an
+empty line for each empty line of the input, which ends a paragraph.
+The one exception is an empty text, for which split returns '', while
+boundary.pl prints a message instead, '<input file> is an empty file!'.
+test_sentence_splitter.py compares the two on random texts.
+"""
+
+import os.path
+import re
+
+import paths
+
+# boundary.pl's placeholder for a missing word (NP) or an empty prefix or
+# suffix of a boundary candidate (sp)
+NO_WORD = 'NP'
+NO_AFFIX = 'sp'
+
+SGML_END_TAG_RE = re.compile(r'</[A-Z]+>$')
+SINGLE_CAPITALS_RE = re.compile(r'(?:[A-Z]\.)*[A-Z]$')
+BLANK_LINE_RE = re.compile(r'\s+$')
+
+TERMINALS = set(['Esq', 'Jr', 'Sr', 'M.D'])
+TIME_ZONES = set(['EDT', 'CST', 'EST'])
+RIGHT_PARENS = set(['}', ')', '-RBR-'])
+RIGHT_QUOTES = set(["'", "''", "'''", '"', '\'"'])
+
+
+def capital(word):
+    return 'Y' if 'A' <= word[ : 1] <= 'Z' else 'N'
+
+def starts_with_quote(word):
+    return word[ : 1] in ("'", '"', '`')
+
+def starts_with_left_paren(word):
+    return word[ : 1] in ('{', '(') or word[ : 5] == '-LBR-'
+
+def ends_with_right_paren(word):
+    return word.endswith('}') or word.endswith(')') or word.endswith('-LBR-')
+
+def starts_with_left_quote(word):
+    return word[ : 1] in ('`', '"')
+
+def ends_in_quote(word):
+    return word.endswith("'") or word.endswith('"')
+
+def is_right_end(word):
+    return word in RIGHT_PARENS or word in RIGHT_QUOTES
+
+def is_left_start(word):
+    return starts_with_left_quote(word) or starts_with_left_paren(word) or capital(word) == 'Y'
+
+def is_time_zone(word):
+    return word[ : 3] in TIME_ZONES
+
+
+def get_word(words, i):
+    """Returns words[i] like perl does, i.e. None if there is no such word."""
+    if -len(words) <= i < len(words):
+        return words[i]
+    return None
+
+
+class SentenceSplitter:
+    def __init__(self, honorifics_fname = None):
+        if honorifics_fname is None:
+            honorifics_fname = os.path.join(paths.SSPLITTER_PATH, 'HONORIFICS')
+
+        with open(honorifics_fname) as honorifics_file:
+            self.honorifics = set(line[ : -1] if line.endswith('\n') else line for line in honorifics_file)
+
+    def split(self, text):
+        """
+        Returns the sentences of the text, one per line, with an empty line
+        after each paragraph that is followed by an empty line.
+        """
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+
+        if text == '':
+            return ''
+
+        output = []
+        lines = text.split('\n')
+        lines = [line + '\n' for line in lines[ : -1]] + ([lines[-1]] if lines[-1] != '' else [])
+
+        paragraph = ''
+        for line in lines:
+            if BLANK_LINE_RE.match(line):
+                self.split_paragraph(paragraph, output)
+                paragraph = ''
+                output.append('\n')
+            else:
+                line = line.lstrip()
+
+                # take care of the hyphens
+                if paragraph.endswith('\n'):
+                    paragraph = paragraph[ : -1]
+                if paragraph[-1 : ] == '-' and paragraph[-2 : -1] != '-':
+                    paragraph = paragraph[ : -1] + line
+                else:
+                    paragraph = paragraph + ' ' + line
+
+        self.split_paragraph(paragraph, output)
+        return ''.join(output)
+
+    def split_paragraph(self, paragraph, output):
+        words = paragraph.split()
+
+        sentence = ''
+        for (i, word) in enumerate(words):
+            # SGML tags in TREC text
+            if SGML_END_TAG_RE.search(word) or word == '<TEXT>' or word == '<DOC>':
+                output.append((sentence + ' ' + word)[1 : ] + '\n')
+                sentence = ''
+                continue
+
+            # the rightmost candidate in the word
+            pos = word.rfind('.')
+            candidate = '.'
+            if word.rfind('?') > pos:
+                pos = word.rfind('?')
+                candidate = '?'
+            if word.rfind('!') > pos:
+                pos = word.rfind('!')
+                candidate = '!'
+
+            sentence = sentence + ' ' + word
+            if pos == -1:
+                continue
+
+            wp1 = get_word(words, i + 1)
+            if wp1 is None:
+                wp1 = wp1C = wp2 = wp2C = NO_WORD
+            else:
+                wp1C = capital(wp1)
+                wp2 = get_word(words, i + 2)
+                if wp2 is None:
+                    wp2 = wp2C = NO_WORD
+                else:
+                    wp2C = capital(wp2)
+
+            prefix = word[ : pos] if pos != 0 else NO_AFFIX
+            suffix = word[pos + 1 : ] if pos != len(word) - 1 else NO_AFFIX
+
+            if self.is_boundary(candidate, prefix, suffix, wp1, wp2, wp1C, wp2C):
+                output.append(sentence[1 : ] + '\n')
+                sentence = ''
+
+        if sentence != '':
+            output.append(sentence[1 : ] + '\n')
+
+    def is_boundary(self, candidate, prefix, suffix, wp1, wp2, wp1C, wp2C):
+        if candidate == '?' or candidate == '!':
+            # the end of the text
+            if wp1 == NO_WORD and wp2 == NO_WORD:
+                return True
+            # a question mark followed by a capitalized word
+            if suffix == NO_AFFIX and wp1C == 'Y':
+                return True
+            if suffix == NO_AFFIX and starts_with_quote(wp1):
+                return True
+            if suffix == NO_AFFIX and wp1 == '--' and wp2C == 'Y':
+                return True
+            if suffix == NO_AFFIX and wp1 == '-RBR-' and wp2C == 'Y':
+                return True
+            # a vertical ellipsis
+            if suffix == NO_AFFIX and wp1 == '.':
+                return True
+            return is_right_end(suffix) and is_left_start(wp1)
+
+        # the end of the text
+        if wp1 == NO_WORD and wp2 == NO_WORD:
+            return True
+        if suffix == NO_AFFIX and starts_with_quote(wp1):
+            return True
+        if suffix == NO_AFFIX and starts_with_left_paren(wp1):
+            return True
+        if suffix == NO_AFFIX and wp1 == '-RBR-' and wp2 == '--':
+            return False
+        if suffix == NO_AFFIX and wp1 in RIGHT_PARENS:
+            return True
+        # numbered lists
+        if candidate == '.' and suffix == NO_AFFIX and ends_with_right_paren(wp1) and wp2C == 'Y':
+            return True
+        # a vertical ellipsis
+        if prefix == NO_AFFIX and suffix == NO_AFFIX and wp1 == '.':
+            return False
+        if suffix == NO_AFFIX and wp1 == '.':
+            return True
+        if suffix == NO_AFFIX and wp1 == '--' and wp2C == 'Y' and ends_in_quote(prefix):
+            return False
+        if suffix == NO_AFFIX and wp1 == '--' and (wp2C == 'Y' or starts_with_quote(wp2)):
+            return True
+        if suffix == NO_AFFIX and wp1C == 'Y' and (prefix == 'p.m' or prefix == 'a.m') and is_time_zone(wp1):
+            return False
+        # a capitalized word after an honorific
+        if suffix == NO_AFFIX and wp1C == 'Y' and prefix + '.' in self.honorifics:
+            return False
+        if suffix == NO_AFFIX and wp1C == 'Y' and starts_with_quote(prefix):
+            return False
+        # a terminal abbreviation
+        if suffix == NO_AFFIX and wp1C == 'Y' and prefix in TERMINALS:
+            return True
+        # a single capital letter, e.g. an initial
+        if suffix == NO_AFFIX and wp1C == 'Y' and SINGLE_CAPITALS_RE.match(prefix):
+            return False
+        # a capitalized word after a period
+        if suffix == NO_AFFIX and wp1C == 'Y':
+            return True
+        return is_right_end(suffix) and is_left_start(wp1)
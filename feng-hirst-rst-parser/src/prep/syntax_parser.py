@@ -10,9 +10,17 @@ Created on 2013-02-17
 '''
 
 import subprocess
+import threading
+import multiprocessing
+import Queue
+import time
 
 import paths
 
+# what ParserDemo (i.e. Stanford's TreePrint) prints instead of the parse
+# of a sentence that it skipped or failed to parse
+SKIPPED_SENTENCE = 'SENTENCE_SKIPPED_OR_UNPARSABLE'
+
 class SyntaxParser:
     
     def __init__(self):
@@ -26,15 +34,94 @@ class SyntaxParser:
         if not init.startswith('Loading parser from serialized file'):
             raise OSError('Could not create a syntax parser subprocess, error info:\n%s' % init)
 
+        # sentences are sent to the parser process and read back under this lock
+        self.lock = threading.Lock()
+        
+        self.start_time = time.time()
+        self.num_sentences = 0
+        self.busy_time = 0.0
+
+    def share(self):
+        """
+        Lets the processes forked after this call use the same parser
+        process, taking turns.
+        """
+        self.lock = multiprocessing.Lock()
+
     
     def parse_sentence(self, s):
         """
         Parses a sentence s
         """
-        #print "%s\n" % s.strip()
-        self.syntax_parser.stdin.write("%s\n" % s.strip())
-        self.syntax_parser.stdin.flush()
+        with self.lock:
+            start = time.time()
+            self.write_sentences([s])
+            result = self.read_result()
+            self.num_sentences += 1
+            self.busy_time += time.time() - start
+        
+        if result is None:
+            raise Exception("Syntactic parsing of the following sentence failed:" + s + "--")
+        return result
+    
+    
+    def parse_sentences(self, sentences):
+        """
+        Parses the sentences, returning a (penn parse, dependencies) tuple
+        for each of them, like parse_sentence. The sentences are streamed to
+        the parser process while their parses are read back, instead of
+        waiting for each parse before sending the next sentence.
+        """
+        if len(sentences) <= 1:
+            return [self.parse_sentence(s) for s in sentences]
+        
+        with self.lock:
+            start = time.time()
+            # write from another thread, otherwise the parser could block on
+            # its full output pipe while we still block on writing its input
+            writer = threading.Thread(target = self.write_sentences, args = (sentences,))
+            writer.start()
+            try:
+                # read all the results even if a sentence fails, so that the
+                # next request starts with a clean pipe
+                results = [self.read_result() for s in sentences]
+            finally:
+                writer.join()
+            self.num_sentences += len(sentences)
+            self.busy_time += time.time() - start
+        
+        for (s, result) in zip(sentences, results):
+            if result is None:
+                raise Exception("Syntactic parsing of the following sentence failed:" + s + "--")
+        return results
+    
+    
+    def write_sentences(self, sentences):
+        # one sentence per line: the parser answers each line with the penn
+        # parse, an empty line, the dependencies and another empty line
+        data = ''.join("%s\n" % s.strip().replace('\n', ' ') for s in sentences)
         
+        try:
+            self.syntax_parser.stdin.write(data)
+            self.syntax_parser.stdin.flush()
+        except IOError:
+            # the parser died; read_result gets nothing back
+            pass
+    
+    
+    def read_result(self):
+        """
+        Reads the parse of one sentence, or returns None if the parser
+        failed on it.
+        
+        The parse is the penn parse, an empty line, the dependencies and
+        another empty line. A sentence the parser skipped or failed on is
+        answered by a single SKIPPED_SENTENCE line, which may be followed by
+        empty lines, e.g. an empty dependency block. Those can't be read
+        right away, as the parser might not print them, so the empty lines
+        before a parse (or SKIPPED_SENTENCE) are skipped instead. Then the
+        parses of the sentences after a skipped one stay in line with them.
+        """
         # Read stderr anyway to avoid problems
         cur_line = "debut"
 
@@ -48,8 +135,12 @@ class SyntaxParser:
             #cur_line = self.syntax_parser.stdout.readline().strip()
             cur_line = self.syntax_parser.stdout.readline()
             # Check for errors
-            if cur_line.strip() == "SENTENCE_SKIPPED_OR_UNPARSABLE":
-                raise Exception("Syntactic parsing of the following sentence failed:" + s + "--")
+            if cur_line.startswith(SKIPPED_SENTENCE):
+                return None
+            
+            if cur_line != '' and cur_line.strip() == '' and not finished_penn_parse and penn_parse_result == '':
+                # what's left of the answer to a skipped sentence
+                continue
             
             #print cur_line
             #print finished_penn_parse
@@ -69,6 +160,17 @@ class SyntaxParser:
         return (penn_parse_result, '\n'.join(dep_parse_results))
     
     
+    def stats(self):
+        """
+        Returns the number of parsed sentences and the utilisation (the
+        fraction of the time that it was busy) of the parser process since
+        it was started.
+        """
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        return {'sentences': self.num_sentences,
+                'utilisation': self.busy_time / elapsed}
+    
+    
     def poll(self):
         """
         Checks that the parser process is still alive
@@ -85,4 +187,132 @@ class SyntaxParser:
             #self.syntax_parser.kill() # Only in Python 2.6+
             self.syntax_parser.stdin.close()
             self.syntax_parser.stdout.close()
-            self.syntax_parser.stderr.close()
\ No newline at end of file
+            self.syntax_parser.stderr.close()
+
+
+class SyntaxParserPool:
+    """
+    Several SyntaxParser processes, which parse the sentences of a request
+    in parallel. It has the same interface as a SyntaxParser.
+    """
+    # maximum number of sentences sent to one parser process at a time
+    BATCH_SIZE = 8
+    
+    def __init__(self, size):
+        # starting a parser process mostly means waiting for it to load its
+        # model, so they are all started at once
+        self.parsers = [None] * size
+        errors = []
+        def start(i):
+            try:
+                self.parsers[i] = SyntaxParser()
+            except Exception, e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target = start, args = (i,)) for i in range(size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if errors:
+            self.unload()
+            raise errors[0]
+        
+        # the number of sentences waiting for a parser process
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.queue_lock = threading.Lock()
+    
+    
+    def share(self):
+        for parser in self.parsers:
+            parser.share()
+    
+    
+    def parse_sentence(self, s):
+        return self.parse_sentences([s])[0]
+    
+    
+    def parse_sentences(self, sentences):
+        """
+        Spreads the sentences over the parser processes in batches and
+        returns their (penn parse, dependencies) tuples in the original order.
+        """
+        batch_size = max(1, min(self.BATCH_SIZE, len(sentences) / len(self.parsers)))
+        batches = Queue.Queue()
+        for start in range(0, len(sentences), batch_size):
+            batches.put(start)
+        
+        with self.queue_lock:
+            self.queue_depth += len(sentences)
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        
+        results = [None] * len(sentences)
+        errors = []
+        def work(parser):
+            # each thread feeds one parser process until the batches run out;
+            # if another process is using the parser (see share), the other
+            # threads take over its batches in the meantime
+            while not errors:
+                try:
+                    start = batches.get_nowait()
+                except Queue.Empty:
+                    return
+                
+                batch = sentences[start : start + batch_size]
+                with self.queue_lock:
+                    self.queue_depth -= len(batch)
+                try:
+                    results[start : start + batch_size] = parser.parse_sentences(batch)
+                except Exception, e:
+                    errors.append(e)
+        
+        threads = [threading.Thread(target = work, args = (parser,)) for parser in self.parsers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        if errors:
+            # the batches left over after the error
+            while not batches.empty():
+                start = batches.get()
+                with self.queue_lock:
+                    self.queue_depth -= len(sentences[start : start + batch_size])
+            
+            raise errors[0]
+        return results
+    
+    
+    def stats(self):
+        """
+        Returns the current and the peak queue depth, and the stats of each
+        parser process (see SyntaxParser.stats). Processes forked from a
+        shared pool (see share) count their own requests only.
+        """
+        with self.queue_lock:
+            (queue_depth, max_queue_depth) = (self.queue_depth, self.max_queue_depth)
+        
+        return {'queue_depth': queue_depth,
+                'max_queue_depth': max_queue_depth,
+                'parsers': [parser.stats() for parser in self.parsers]}
+    
+    
+    def poll(self):
+        """
+        Checks that the parser processes are still alive
+        """
+        return any(parser is None or parser.poll() for parser in self.parsers)
+    
+    
+    def unload(self):
+        if all(parser is not None for parser in self.parsers):
+            stats = self.stats()
+            print 'Syntax parser pool: peak queue depth %d sentences' % stats['max_queue_depth']
+            for (i, parser_stats) in enumerate(stats['parsers']):
+                print 'Syntax parser %d: %d sentences, %.0f%% utilisation' % (i, parser_stats['sentences'], parser_stats['utilisation'] * 100)
+        
+        for parser in self.parsers:
+            if parser is not None:
+                parser.unload()
@@ -61,6 +61,7 @@ def check_syntax_parser(sents):
 def check_CRFSuite():
     crfsuite_test_file = os.path.join(paths.CRFSUITE_PATH, 'test.txt')
     vectors = open(crfsuite_test_file).read().strip().split('\n')
+    items = [vector.split('\t')[1 : ] for vector in vectors]
     for (model_name, model_type, model_path, model_file) in [('segmentation', 'segmenter', paths.SEGMENTER_MODEL_PATH, 'seg.crfsuite'),
                                      ('segmentation 2nd pass', 'segmenter', paths.SEGMENTER_MODEL_PATH, 'seg_global_features.crfsuite'),
                                      ('treebuilding intra-sentnetial structure', 'treebuilder', paths.TREE_BUILD_MODEL_PATH, 'struct/intra.crfsuite'),
@@ -70,7 +71,7 @@ def check_CRFSuite():
         try:
             print '*** Loading classifier %s...' % model_name
             classifier = CRFClassifier(model_name, model_type, model_path, model_file, False)
-            classifier.classify(vectors)
+            classifier.classify([classifier.compile(fields) for fields in items])
             classifier.unload()
         except Exception, e:
             raise e
@@ -6,13 +6,13 @@ Created on 2014-01-11
 from features.segmenter_feature_writer import SegmenterFeatureWriter
 from classifiers.crf_classifier import CRFClassifier
 import paths
-import utils.utils
 from document.token import Token
 
 class CRFSegmenter:
-    def __init__(self, _name = 'crf_segmenter', verbose = False, global_features = False):
+    def __init__(self, _name = 'crf_segmenter', verbose = False, global_features = False, crf_backend = None):
         self.name = _name
         self.verbose = verbose
+        self.crf_backend = crf_backend
         
         self.feature_writer = SegmenterFeatureWriter()
         
@@ -27,7 +27,8 @@ class CRFSegmenter:
                                           model_type = 'segmenter',
                                           model_path = paths.SEGMENTER_MODEL_PATH,
                                           model_file = 'seg.crfsuite',
-                                          verbose = self.verbose)
+                                          verbose = self.verbose,
+                                          backend = self.crf_backend)
         self.add_classifier(classifier1, 'classifier1')
            
         if self.global_features:
@@ -35,7 +36,8 @@ class CRFSegmenter:
                                               model_type = 'segmenter',
                                               model_path = paths.SEGMENTER_MODEL_PATH,
                                               model_file = 'seg_global_features.crfsuite',
-                                              verbose = self.verbose)
+                                              verbose = self.verbose,
+                                              backend = self.crf_backend)
         
         
         
@@ -75,11 +77,20 @@ class CRFSegmenter:
         self.classifiers.append(classifier)
     
     
+    def share(self):
+        for classifier in self.classifiers:
+            classifier.share()
+
     def unload(self):
         for classifier in self.classifiers:
             classifier.unload()
         
     def write_features(self, sentence, input_edu_segmentation = None):
+        if input_edu_segmentation:
+            classifier = self.global_features_classifier
+        else:
+            classifier = self.classifier
+        
         features = []
         #print sentence.sent_id
 #        edu_segmentation = sentence.doc.edu_word_segmentation[sentence.sent_id]
@@ -95,9 +106,8 @@ class CRFSegmenter:
 #            print edu_segmentation
             
             inst_features = self.feature_writer.write_features([token0, token1, token2, token3], edu_segmentation) 
-            feature_str = '\t'.join(list(inst_features))
-#            print feature_str
-            features.append('0\t%s' % feature_str)
+#            print inst_features
+            features.append(classifier.compile(inst_features))
             
 #            feature_str = ' '.join(list(inst_features))
 ##            print feature_str
@@ -186,10 +196,11 @@ class CRFSegmenter:
         
         edu_word_segmentations.append((start, len(sentence.tokens)))
         
+        unescaped_words = sentence.get_token_table().unescaped_words
         for (start_word, end_word) in edu_word_segmentations:
             edu = []
             for j in range(start_word, end_word):
-                edu.extend(utils.utils.unescape_penn_special_word(sentence.tokens[j].word).split(' '))
+                edu.extend(unescaped_words[j].split(' '))
             
             if end_word == len(sentence.tokens):
 #                print sentence.raw_text
@@ -267,6 +278,7 @@ class CRFSegmenter:
             
         doc.start_edu = 0
         doc.end_edu = len(doc.edus)
+        doc.index_edus()
         
     def segment(self, doc):
         doc.edu_word_segmentation = []
@@ -295,4 +307,5 @@ class CRFSegmenter:
             
         
         doc.start_edu = 0
-        doc.end_edu = len(doc.edus) 
\ No newline at end of file
+        doc.end_edu = len(doc.edus)
+        doc.index_edus() 
\ No newline at end of file
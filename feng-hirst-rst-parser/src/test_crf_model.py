@@ -0,0 +1,91 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the NumPy CRF backend (classifiers/crf_model.py), which don't need
+crfsuite or the parser's models. test_data/tiny.crfsuite was trained with
+
+    crfsuite learn -m test_data/tiny.crfsuite test_data/tiny_train.txt
+
+and the expected results are what 'crfsuite tag -p -i' prints for it.
+"""
+
+import itertools
+import os
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from classifiers.crf_classifier import CRFClassifier
+from classifiers.crf_model import CRFModel, read_attributes
+
+
+TEST_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
+TINY_MODEL = 'tiny.crfsuite'
+
+# the features of the items of each sequence, and what 'crfsuite tag -p -i'
+# prints for it: the probability of the best label sequence and the labels
+# with their marginal probabilities
+SEQUENCES = [
+    ([['Num_EDUs=1', 'Cue=but', 'Word=a\\:b', 'Dist:2.5'],
+      ['Cue=and', 'Dist:0.5', 'Unknown=1'],
+      ['Num_EDUs=3', 'Word=a\\:c']],
+     (0.199217, [('Contrast[S][N]', 0.583532), ('Joint[N][N]', 0.632244), ('Elaboration[N][S]', 0.528594)])),
+    ([['Num_EDUs=2', 'Cue=which']],
+     (0.524343, [('Elaboration[N][S]', 0.524343)])),
+    # only unknown attributes: all labels are equally likely, and the
+    # first one wins
+    ([['Unknown=2']],
+     (0.333333, [('Elaboration[N][S]', 0.333333)])),
+    ([['Cue=but', 'Cue=and'],
+      ['Num_EDUs=1', 'Dist'],
+      ['Word=a\\:b', 'Dist:1'],
+      ['Cue=none']],
+     (0.095679, [('Contrast[S][N]', 0.788422), ('Elaboration[N][S]', 0.530210),
+                 ('Joint[N][N]', 0.361476), ('Elaboration[N][S]', 0.555307)])),
+]
+
+
+def test_crf_model_dictionaries():
+    """The labels and the attributes are read from the model's CQDBs."""
+    model_fname = os.path.join(TEST_DATA_PATH, TINY_MODEL)
+    model = CRFModel(model_fname)
+    assert model.labels == ['Elaboration[N][S]', 'Contrast[S][N]', 'Joint[N][N]']
+    assert read_attributes(model_fname) == model.attributes
+    assert sorted(model.attributes) == ['Cue=and', 'Cue=but', 'Cue=none', 'Cue=which', 'Dist',
+                                        'Num_EDUs=1', 'Num_EDUs=2', 'Num_EDUs=3', 'Word=a:b', 'Word=a:c']
+
+
+def test_crf_model_tag():
+    """The NumPy backend tags the sequences like 'crfsuite tag' does."""
+    classifier = CRFClassifier('tiny', 'CRF', TEST_DATA_PATH, TINY_MODEL, False, backend = 'numpy')
+    try:
+        compiled = [[classifier.compile(fields) for fields in sequence] for (sequence, expected) in SEQUENCES]
+        for (items, (sequence, expected)) in zip(compiled, SEQUENCES):
+            assert classifier.classify(items) == expected
+        assert classifier.classify_many(compiled) == [expected for (sequence, expected) in SEQUENCES]
+    finally:
+        classifier.unload()
+
+
+def test_crf_model_brute_force():
+    """Viterbi and forward-backward agree with enumerating all label sequences."""
+    model = CRFModel(os.path.join(TEST_DATA_PATH, TINY_MODEL))
+    rng = numpy.random.RandomState(0)
+    for T in range(1, 5):
+        state = rng.normal(size = (2, T, model.num_labels))
+        results = model.tag(state)
+        for b in range(2):
+            scores = {}
+            for path in itertools.product(range(model.num_labels), repeat = T):
+                scores[path] = state[b, range(T), path].sum() + sum(model.trans[path[t - 1], path[t]] for t in range(1, T))
+            norm = sum(numpy.exp(score) for score in scores.values())
+            best = max(scores, key = lambda path: scores[path])
+
+            (seq_prob, predictions) = results[b]
+            assert [label for (label, prob) in predictions] == [model.labels[y] for y in best]
+            assert abs(seq_prob - numpy.exp(scores[best]) / norm) < 1e-9
+            for (t, (label, prob)) in enumerate(predictions):
+                marginal = sum(numpy.exp(score) for (path, score) in scores.items() if path[t] == best[t]) / norm
+                assert abs(prob - marginal) < 1e-9
@@ -7,9 +7,19 @@ Tests for the Feng/Hirst RST parser and our preprocessor/wrapper
 parser_wrapper.py.
 """
 
+import glob
+import json
+import os
+import re
+import shutil
 import sys
+from StringIO import StringIO
+
 import pytest
+from benchmark_decoding import get_agreement
+from parse import DiscourseParser, get_doc_filename, parse_args
 from parser_wrapper import main as wrapper_main
+from parser_worker import ParserWorker
 
 
 EXPECTED_PARSETREE_SHORT = """ParseTree(\'Contrast[S][N]\', ["Although they did n\'t like it ,", \'they accepted the offer .\'])\n"""
@@ -31,8 +41,259 @@ def test_feng_long():
     result = parse_file('../texts/input_long.txt')
     assert result == EXPECTED_PARSETREE_LONG
 
+@pytest.mark.parametrize('backend', ['swig', 'numpy', 'subprocess'])
+def test_feng_crf_backend(backend):
+    """All CRF backends produce the expected output."""
+    sys.argv = ['parser_wrapper.py', '-b', backend, '../texts/input_long.txt']
+    assert wrapper_main() == EXPECTED_PARSETREE_LONG
+
 def test_feng_fail():
     """The Feng/Hirst parser fails on non-existing input file."""
     with pytest.raises(Exception) as excinfo:
         result = parse_file('does_not_exist.txt')
     assert "Expected one parse tree as a result, but got: []" in excinfo.value.args[0]
+
+
+def test_feng_batch(tmpdir):
+    """The wrapper parses a whole directory with one parser instance."""
+    input_dir = tmpdir.mkdir('input')
+    output_dir = tmpdir.join('output')
+    shutil.copy('../texts/input_short.txt', str(input_dir))
+    shutil.copy('../texts/input_long.txt', str(input_dir))
+
+    sys.argv = ['parser_wrapper.py', str(input_dir), str(output_dir)]
+    failures = wrapper_main()
+    assert failures == []
+    assert output_dir.join('input_short.txt.parse').read() == EXPECTED_PARSETREE_SHORT
+    assert output_dir.join('input_long.txt.parse').read() == EXPECTED_PARSETREE_LONG
+
+
+def test_feng_batch_failure(tmpdir):
+    """A file without a tree is reported, and the files after it are parsed."""
+    input_dir = tmpdir.mkdir('input')
+    output_dir = tmpdir.join('output')
+    shutil.copy('../texts/input_short.txt', str(input_dir))
+    shutil.copy('../texts/input_long.txt', str(input_dir))
+    # sorted between the two, so it's parsed in the middle of the batch
+    input_dir.join('input_middle.txt').write('')
+
+    sys.argv = ['parser_wrapper.py', str(input_dir), str(output_dir)]
+    failures = wrapper_main()
+    assert [filepath for (filepath, error) in failures] == [str(input_dir.join('input_middle.txt'))]
+    assert output_dir.join('input_short.txt.parse').read() == EXPECTED_PARSETREE_SHORT
+    assert output_dir.join('input_long.txt.parse').read() == EXPECTED_PARSETREE_LONG
+
+
+def test_feng_batch_pool(tmpdir):
+    """Workers forked from one loaded parser produce the expected output."""
+    input_dir = tmpdir.mkdir('input')
+    output_dir = tmpdir.join('output')
+    shutil.copy('../texts/input_short.txt', str(input_dir))
+    shutil.copy('../texts/input_long.txt', str(input_dir))
+
+    sys.argv = ['parser_wrapper.py', '-w', '2', '-p', '-b', 'subprocess', str(input_dir), str(output_dir)]
+    failures = wrapper_main()
+    assert failures == []
+    # the parser's and the workers' STDOUT files are removed
+    assert glob.glob('parser.*.stdout') == []
+    assert output_dir.join('input_short.txt.parse').read() == EXPECTED_PARSETREE_SHORT
+    assert output_dir.join('input_long.txt.parse').read() == EXPECTED_PARSETREE_LONG
+
+
+def test_feng_parse_cache(tmpdir):
+    """Sentences parsed before are taken from the parse cache."""
+    cache_dir = str(tmpdir.join('parse_cache'))
+    for _ in range(2):
+        sys.argv = ['parser_wrapper.py', '-c', cache_dir, '../texts/input_long.txt']
+        assert wrapper_main() == EXPECTED_PARSETREE_LONG
+    assert tmpdir.join('parse_cache').listdir()
+
+
+def test_feng_parse_text():
+    """parse_text parses a string without any input or output files."""
+    sys.argv = ['parse.py']
+    options, _ = parse_args(require_input=False)
+    parser = DiscourseParser(options=options)
+    try:
+        tree, edus = parser.parse_text(open('../texts/input_short.txt').read())
+    finally:
+        parser.unload()
+
+    assert tree.__repr__() + '\n' == EXPECTED_PARSETREE_SHORT
+    assert edus == ["Although they did n't like it ,", 'they accepted the offer .']
+
+
+@pytest.mark.parametrize('doc_id', ['../escaped', 'a/b', '/tmp/absolute', '..', u'd\xf6c'])
+def test_get_doc_filename(doc_id):
+    """Any document id gives a distinct file name within the output directory."""
+    fname = get_doc_filename(doc_id)
+    assert fname == os.path.basename(fname)
+    assert re.match(r'[A-Za-z0-9_-][A-Za-z0-9._-]*$', fname)
+    assert fname != get_doc_filename(doc_id + 'x')
+    assert get_doc_filename('plain_id-1.txt') == 'plain_id-1.txt'
+
+
+def test_feng_parse_text_doc_id(tmpdir):
+    """parse_text saves the document data within the output directory."""
+    sys.argv = ['parse.py', '-e']
+    options, _ = parse_args(require_input=False)
+    output_dir = tmpdir.mkdir('output')
+    parser = DiscourseParser(options=options, output_dir=str(output_dir))
+    try:
+        tree, edus = parser.parse_text(open('../texts/input_short.txt').read(), doc_id='../escaped')
+    finally:
+        parser.unload()
+
+    assert tree.__repr__() + '\n' == EXPECTED_PARSETREE_SHORT
+    assert tmpdir.listdir() == [output_dir]
+    assert [f.basename for f in output_dir.listdir()] == [get_doc_filename('../escaped') + '.doc.ser']
+
+
+def test_feng_parse_text_single_edu():
+    """A text of a single EDU is parsed into a tree of that EDU."""
+    sys.argv = ['parser_worker.py']
+    options, _ = parse_args(require_input=False)
+    worker = ParserWorker(options)
+    try:
+        response = worker.parse('single', 'Great product.')
+    finally:
+        worker.unload()
+
+    assert response['edus'] == ['Great product .']
+    assert response['tree'] == "ParseTree('n/a', ['Great product .'])"
+
+
+def test_feng_incremental():
+    """Incremental tree building keeps all EDUs in the tree."""
+    # a sentence of two EDUs is merged and labeled the same way in both modes
+    sys.argv = ['parser_wrapper.py', '-i', '../texts/input_short.txt']
+    assert wrapper_main() == EXPECTED_PARSETREE_SHORT
+
+    sys.argv = ['parse.py', '-i']
+    options, _ = parse_args(require_input=False)
+    parser = DiscourseParser(options=options)
+    try:
+        tree, edus = parser.parse_text(open('../texts/input_long.txt').read())
+    finally:
+        parser.unload()
+
+    assert tree.leaves() == edus
+
+
+def test_feng_incremental_agreement():
+    """
+    Incremental tree building only approximates the default greedy one, so
+    its trees are checked for agreement with the greedy trees, not equality.
+    """
+    sys.argv = ['parse.py']
+    greedy_parser = DiscourseParser(options=parse_args(require_input=False)[0])
+    sys.argv = ['parse.py', '-i']
+    incremental_parser = DiscourseParser(options=parse_args(require_input=False)[0])
+    total_agreement = [0, 0, 0, 0]
+    try:
+        for filepath in sorted(glob.glob('../texts/*.txt')):
+            text = open(filepath).read()
+            greedy_tree, greedy_edus = greedy_parser.parse_text(text)
+            incremental_tree, incremental_edus = incremental_parser.parse_text(text)
+
+            assert incremental_edus == greedy_edus
+            assert incremental_tree.leaves() == greedy_tree.leaves()
+            agreement = get_agreement(incremental_tree, greedy_tree)
+            total_agreement = [a + b for (a, b) in zip(total_agreement, agreement)]
+    finally:
+        greedy_parser.unload()
+        incremental_parser.unload()
+
+    # shares of the spans, spans with nuclearity and spans with relation
+    # of the incremental trees that are also in the greedy trees
+    span, nuclearity, relation = [float(a) / total_agreement[-1] for a in total_agreement[:-1]]
+    assert span >= 0.9, total_agreement
+    assert nuclearity >= 0.8, total_agreement
+    assert relation >= 0.7, total_agreement
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'subprocess'])
+def test_feng_sentence_workers(backend):
+    """Parsing the sentences in forked processes doesn't change the tree."""
+    sys.argv = ['parser_wrapper.py', '-n', '3', '-b', backend, '../texts/input_long.txt']
+    assert wrapper_main() == EXPECTED_PARSETREE_LONG
+
+
+def test_feng_budget():
+    """Once the budget has run out, the rest of the tree is right-branching."""
+    sys.argv = ['parse.py', '--crf_call_budget', '10']
+    options, _ = parse_args(require_input=False)
+    parser = DiscourseParser(options=options)
+    status = {}
+    try:
+        tree, edus = parser.parse_text(open('../texts/input_long.txt').read(), status=status)
+        stats = parser.treebuilder.stats()
+    finally:
+        parser.unload()
+
+    assert status['degraded'] is True
+    assert stats == {'documents': 1, 'budget_exhaustions': 1}
+    assert tree.leaves() == edus
+    assert tree.label() == 'Elaboration[N][S]'
+
+
+def test_feng_budget_cached_results():
+    """Only the CRF sequences that aren't cached yet count against the budget."""
+    sys.argv = ['parse.py', '--crf_call_budget', '100000']
+    options, _ = parse_args(require_input=False)
+    parser = DiscourseParser(options=options)
+    text = open('../texts/input_long.txt').read()
+    first, second = {}, {}
+    try:
+        parser.parse_text(text, status=first)
+        parser.parse_text(text, status=second)
+    finally:
+        parser.unload()
+
+    assert first['crf_calls'] > 0 and not first['degraded']
+    assert second['crf_calls'] == 0 and not second['degraded']
+
+
+def test_feng_shift_reduce():
+    """Long documents are parsed by shift-reduce decoding, short ones greedily."""
+    sys.argv = ['parse.py', '--shift_reduce_edus', '10']
+    options, _ = parse_args(require_input=False)
+    parser = DiscourseParser(options=options)
+    long_status, short_status = {}, {}
+    try:
+        long_tree, long_edus = parser.parse_text(open('../texts/input_long.txt').read(), status=long_status)
+        short_tree, _ = parser.parse_text(open('../texts/input_short.txt').read(), status=short_status)
+        greedy_tree, _ = parser.parse_text(open('../texts/input_long.txt').read(), decoding='greedy')
+    finally:
+        parser.unload()
+
+    assert long_status['decoding'] == 'shift-reduce'
+    assert long_tree.leaves() == long_edus
+    assert short_status['decoding'] == 'greedy'
+    assert short_tree.__repr__() + '\n' == EXPECTED_PARSETREE_SHORT
+    assert greedy_tree.__repr__() + '\n' == EXPECTED_PARSETREE_LONG
+
+
+def test_feng_worker():
+    """The worker answers each JSON request with one JSON parse result."""
+    sys.argv = ['parser_worker.py']
+    options, _ = parse_args(require_input=False)
+    worker = ParserWorker(options)
+    requests = StringIO(
+        json.dumps({'id': 'short', 'text': open('../texts/input_short.txt').read()}) + '\n' +
+        json.dumps({'id': 'missing'}) + '\n')
+    responses = StringIO()
+    try:
+        worker.serve(requests, responses)
+    finally:
+        worker.unload()
+
+    short, missing = [json.loads(line) for line in responses.getvalue().splitlines()]
+    assert short['id'] == 'short'
+    assert short['tree'] + '\n' == EXPECTED_PARSETREE_SHORT
+    assert short['edus'] == ["Although they did n't like it ,", 'they accepted the offer .']
+    assert short['degraded'] is False
+    assert short['crf_calls'] is None
+    assert short['decoding'] == 'greedy'
+    assert short['stats']['tree_building'] == {'documents': 1, 'budget_exhaustions': 0}
+    assert missing['id'] == 'missing' and 'error' in missing
@@ -0,0 +1,99 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the parse cache (prep/parse_cache.py), which don't need the
+Stanford parser.
+"""
+
+import multiprocessing
+import os
+import stat
+
+from prep import parse_cache
+from prep.parse_cache import ParseCache
+
+
+PARSE = ('(ROOT (S (NP (PRP They)) (VP (VBD accepted) (NP (DT the) (NN offer))) (. .)))',
+         'nsubj(accepted-2, They-1)\ndet(offer-4, the-3)\ndobj(accepted-2, offer-4)')
+
+
+def get_cache_size(cache):
+    return sum(size for (mtime, size, path) in cache.get_entries())
+
+
+def test_parse_cache_key(tmpdir, monkeypatch):
+    """Entries are found by the parser version and the normalized sentence."""
+    cache = ParseCache(str(tmpdir))
+    assert cache.get('They accepted the offer .') is None
+
+    cache.put('They accepted the offer .', PARSE)
+    assert cache.get(' They  accepted\tthe offer .\n') == PARSE
+    assert cache.get('They accepted the offer !') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    monkeypatch.setattr(parse_cache, 'PARSER_VERSION', 'another-parser')
+    assert cache.get('They accepted the offer .') is None
+
+
+def test_parse_cache_entry_mode(tmpdir):
+    """Entries can be read by the workers of other users."""
+    cache = ParseCache(str(tmpdir))
+    cache.put('They accepted the offer .', PARSE)
+    (mtime, size, path) = cache.get_entries()[0]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0644
+
+
+def test_parse_cache_eviction(tmpdir):
+    """The least recently used entries are evicted down to 90% of the size."""
+    # room for ten entries of about 1000 bytes
+    cache = ParseCache(str(tmpdir), max_size = 10000 / (1024.0 * 1024))
+    parse = ('x' * 900, 'y' * 99)
+    for i in range(10):
+        cache.put('sentence %d' % i, parse)
+        os.utime(cache.get_path('sentence %d' % i), (i, i))
+    assert get_cache_size(cache) == 10000
+
+    # the oldest entries but one are used again
+    os.utime(cache.get_path('sentence 0'), (20, 20))
+    cache.put('sentence 10', parse)
+
+    assert get_cache_size(cache) <= cache.max_size * parse_cache.EVICTION_TARGET
+    assert cache.get('sentence 0') == parse
+    assert cache.get('sentence 1') is None
+    assert cache.get('sentence 2') is None
+    assert cache.get('sentence 10') == parse
+
+
+def put_sentences(cache_dir, worker):
+    cache = ParseCache(cache_dir, max_size = 20000 / (1024.0 * 1024))
+    for i in range(200):
+        # the workers share half of their sentences
+        s = 'sentence %d' % (i if i % 2 == 0 else worker * 1000 + i)
+        cache.put(s, ('(ROOT %s)' % s, 'dep(%s)' % s))
+        cache.get(s)
+
+
+def test_parse_cache_concurrent_writers(tmpdir):
+    """Workers writing and evicting at the same time leave complete entries."""
+    cache_dir = str(tmpdir)
+    workers = [multiprocessing.Process(target = put_sentences, args = (cache_dir, worker))
+               for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    cache = ParseCache(cache_dir)
+    entries = cache.get_entries()
+    assert entries
+    for (mtime, size, path) in entries:
+        (penn_parse, deps) = open(path).read().split('\n', 1)
+        s = penn_parse[len('(ROOT ') : -1]
+        assert deps == 'dep(%s)' % s
+        assert cache.get_path(s) == path
+
+    # no temporary files are left behind
+    for subdir in os.listdir(cache_dir):
+        assert not [fname for fname in os.listdir(os.path.join(cache_dir, subdir)) if fname.startswith('.')]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the single-pass reader of the Stanford parser's penn parses
+(prep/prep_utils.py:read_parse), which compare it with reading the parse
+with LexicalizedTree.fromstring and lexicalizing it with
+create_lexicalized_tree, without the Stanford parser.
+"""
+
+import random
+
+import pytest
+
+from prep.prep_utils import LEAF_PATTERN, create_lexicalized_tree, read_parse
+from trees.lexicalized_tree import LexicalizedTree
+
+
+def read_lines(parse_lines):
+    """Joins the lines of a penn parse like SyntaxParser.read_result."""
+    return ''.join(line.strip() for line in parse_lines.split('\n'))
+
+
+# penn parses as printed by the Stanford parser, with the governor of each
+# token in their dependencies
+SHORT_PARSE = read_lines("""(ROOT
+  (S
+    (SBAR (IN Although)
+      (S
+        (NP (PRP they))
+        (VP (VBD did) (RB n't)
+          (VP (VB like)
+            (NP (PRP it))))))
+    (, ,)
+    (NP (PRP they))
+    (VP (VBD accepted)
+      (NP (DT the) (NN offer)))
+    (. .)))""")
+SHORT_GOVERNORS = {1: 5, 2: 5, 3: 5, 4: 5, 5: 9, 6: 5, 7: 9, 8: 9, 10: 11, 11: 9, 12: 9}
+
+SPECIAL_PARSE = read_lines("""(ROOT
+  (NP
+    (NP (NNP U.S.) (NNS sales))
+    (PRN (-LRB- -LRB-)
+      (QP ($ $) (CD 3/4))
+      (-RRB- -RRB-))
+    (`` ``) (NN growth) ('' '')
+    (. !)))""")
+SPECIAL_GOVERNORS = {1: 2, 3: 5, 4: 5, 5: 2, 6: 5, 8: 2, 10: 2}
+
+
+def read_reference(parse_tree_str, governors):
+    """Reads and lexicalizes the parse the way read_parse replaces."""
+    tree = LexicalizedTree.fromstring(parse_tree_str, leaf_pattern = LEAF_PATTERN)
+    leaves = tree.leaves()
+    tags = [tree[tree.leaf_treeposition(i)[ : -1]].label() for i in range(len(leaves))]
+    heads = [[word, tag, governors.get(i + 1, 0)] for (i, (word, tag)) in enumerate(zip(leaves, tags))]
+    return tree, create_lexicalized_tree(tree, heads), leaves, tags
+
+
+def get_heads(tree):
+    return [(subtree.label(), subtree.head, subtree.head_sup) for subtree in tree.subtrees()]
+
+
+def check_read_parse(parse_tree_str, governors):
+    (tree, lexicalized_tree, leaves, tags) = read_parse(parse_tree_str, governors)
+    (ref_tree, ref_lexicalized_tree, ref_leaves, ref_tags) = read_reference(parse_tree_str, governors)
+
+    assert tree == ref_tree
+    assert (leaves, tags) == (ref_leaves, ref_tags)
+    assert lexicalized_tree == ref_lexicalized_tree
+    assert get_heads(lexicalized_tree) == get_heads(ref_lexicalized_tree)
+    assert lexicalized_tree.leaf_array == ref_lexicalized_tree.leaf_array
+    assert lexicalized_tree.leaf_positions == ref_lexicalized_tree.leaf_positions
+
+
+@pytest.mark.parametrize(('parse_tree_str', 'governors'),
+                         [(SHORT_PARSE, SHORT_GOVERNORS), (SPECIAL_PARSE, SPECIAL_GOVERNORS),
+                          ('(ROOT (FRAG (NN Offer)))', {}), ('(ROOT (X (Y (Z word))))', {1: 0})],
+                         ids = ['short', 'special-characters', 'fragment', 'unary-chain'])
+def test_read_parse(parse_tree_str, governors):
+    """The sample parses are read and lexicalized like fromstring and lexicalize do."""
+    check_read_parse(parse_tree_str, governors)
+
+
+def random_parse(rng, depth = 0):
+    if depth > 0 and rng.random() < 0.4:
+        return '(%s %s)' % (rng.choice(['NN', 'VB', 'DT', 'IN', ',', '.']), rng.choice(['a', 'b', 'c', '-LRB-', 'U.S.', '$']))
+
+    children = [random_parse(rng, depth + 1) for _ in range(rng.randint(1, 3 if depth < 4 else 1))]
+    return '(%s %s)' % (rng.choice(['S', 'NP', 'VP', 'PP']), rng.choice(['', ' ']).join(children))
+
+
+def test_read_parse_random():
+    """Random parses and dependencies give the same trees and heads."""
+    rng = random.Random(0)
+    for _ in range(300):
+        parse_tree_str = '(ROOT%s)' % random_parse(rng)
+        num_tokens = len(LexicalizedTree.fromstring(parse_tree_str, leaf_pattern = LEAF_PATTERN).leaves())
+        governors = dict((i, rng.randint(0, num_tokens)) for i in range(1, num_tokens + 1) if rng.random() < 0.9)
+        check_read_parse(parse_tree_str, governors)
+
+
+def test_read_parse_null_elements():
+    """Parses with null elements are read, but left to create_lexicalized_tree."""
+    parse_tree_str = '(ROOT (S (NP (-NONE- *T*-1)) (VP (VBD left)) (. .)))'
+    (tree, lexicalized_tree, leaves, tags) = read_parse(parse_tree_str, {})
+    assert tree == LexicalizedTree.fromstring(parse_tree_str, leaf_pattern = LEAF_PATTERN)
+    assert lexicalized_tree is None
+    assert (leaves, tags) == (['*T*-1', 'left', '.'], ['-NONE-', 'VBD', '.'])
+
+
+@pytest.mark.parametrize('parse_tree_str', ['(ROOT (NN a)) (ROOT (NN b))', '(ROOT (NN a)', '(ROOT (NN a)))', '(ROOT (NN a)) b', ''],
+                         ids = ['two-trees', 'unclosed', 'unopened', 'trailing-leaf', 'empty'])
+def test_read_parse_malformed(parse_tree_str):
+    """Parses that can't be read in a single pass are left to fromstring."""
+    assert read_parse(parse_tree_str, {}) == (None, None, None, None)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Compares the python sentence splitter (prep/sentence_splitter.py) with
+boundary.pl, the perl script it was ported from, on random texts.
+"""
+
+import distutils.spawn
+import os
+import random
+import subprocess
+
+import pytest
+
+import paths
+from prep.sentence_splitter import SentenceSplitter
+
+
+BOUNDARY_PL = os.path.join(paths.SSPLITTER_PATH, 'boundary.pl')
+HONORIFICS = os.path.join(paths.SSPLITTER_PATH, 'HONORIFICS')
+
+# words that exercise the rules of boundary.pl: honorifics, initials,
+# abbreviations, quotes, parentheses, dashes, time zones and SGML tags
+WORDS = ['the', 'offer', 'They', 'accepted', 'it', 'Although', 'In', 'we',
+         'it.', 'it?', 'it!', 'it?!', 'offer.', 'Offer.', 'end.)', 'end."', "end.''", "end.'",
+         'Dr.', 'Mr.', 'Mrs.', 'Gen.', 'Jr.', 'Esq.', 'M.D.', 'J.', 'U.S.', 'A.B.C.',
+         'p.m.', 'a.m.', 'EST', 'EDT', 'CST', 'e.g.', 'i.e.', '3.5', '$4.25', 'No.', '.', '...',
+         '"', "''", "'", '`', '``', '"Yes', "'Tis", '(', ')', '(a)', '1)', '{', '}',
+         '-LBR-', '-RBR-', '-RBR-.', '--', '-', 'well-', 'known', '<TEXT>', '<DOC>', '</P>', 'x</TEXT>']
+SPACES = [' ', ' ', ' ', '  ', '\t', ' \t ']
+
+
+def random_text(rng):
+    lines = []
+    for _ in range(rng.randint(0, 12)):
+        if rng.random() < 0.15:
+            # an empty line, which ends a paragraph
+            lines.append(rng.choice(['', ' ', '\t', '  ']))
+            continue
+
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 10))]
+        line = ''.join(rng.choice(SPACES) + word for word in words)
+        if rng.random() > 0.3:
+            line = line.lstrip()
+        lines.append(line)
+
+    text = '\n'.join(lines)
+    if text and rng.random() < 0.7:
+        text += '\n'
+    return text
+
+
+def run_boundary_pl(tmpdir, text):
+    input_file = tmpdir.join('input.txt')
+    input_file.write(text, mode = 'wb')
+    return subprocess.check_output(['perl', BOUNDARY_PL, '-d', HONORIFICS, '-i', str(input_file)])
+
+
+@pytest.mark.skipif(distutils.spawn.find_executable('perl') is None, reason = 'needs perl')
+@pytest.mark.parametrize('seed', range(4))
+def test_sentence_splitter_matches_boundary_pl(tmpdir, seed):
+    """The splitter prints what boundary.pl prints for any non-empty text."""
+    splitter = SentenceSplitter(HONORIFICS)
+    rng = random.Random(seed)
+    for _ in range(100):
+        text = random_text(rng)
+        if text == '':
+            # boundary.pl prints that the file is empty
+            assert splitter.split(text) == ''
+            continue
+
+        assert splitter.split(text) == run_boundary_pl(tmpdir, text), repr(text)
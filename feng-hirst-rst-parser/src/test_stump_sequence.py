@@ -0,0 +1,82 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the stump sequence of the greedy parsers (parsers/stump_sequence.py),
+which compare it with scanning and splicing the plain lists of constituents
+and scores, without the parser's models.
+"""
+
+import random
+
+from parsers.stump_sequence import StumpSequence
+
+
+class Stump:
+    """A stand-in for a constituent, spanning EDUs l_start to r_end."""
+    def __init__(self, l_start, r_end):
+        self.l_start = l_start
+        self.r_end = r_end
+
+    def __repr__(self):
+        return 'Stump(%d, %d)' % (self.l_start, self.r_end)
+
+
+def get_spans(constituents):
+    return [(c.l_start, c.r_end) for c in constituents]
+
+
+def test_stump_sequence_random_merges():
+    """The pairs are merged in the order of a brute-force argmax over the scores."""
+    rng = random.Random(0)
+    for _ in range(300):
+        n = rng.randint(2, 12)
+        # few distinct scores, so that ties are common
+        new_score = lambda: rng.choice([0.1, 0.5, 0.5, 0.9])
+
+        constituents = [Stump(i, i + 1) for i in range(n)]
+        scores = [new_score() for i in range(n - 1)]
+        stumps = StumpSequence(constituents)
+        for (node, score) in zip(stumps.get_nodes(), scores):
+            stumps.set_score(node, score)
+
+        while len(constituents) > 1:
+            # the leftmost of the best pairs
+            i = scores.index(max(scores))
+            node = stumps.pop_best()
+            assert node.constituent is constituents[i]
+            assert node.next.constituent is constituents[i + 1]
+
+            new_constituent = Stump(constituents[i].l_start, constituents[i + 1].r_end)
+            stumps.merge(node, new_constituent)
+            constituents[i : i + 2] = [new_constituent]
+            del scores[i]
+            assert stumps.get_constituents() == constituents
+            assert len(stumps) == len(constituents)
+
+            # rescore the pairs next to the new stump, and sometimes another
+            # pair, whose old scores are invalidated
+            nodes = stumps.get_nodes()
+            rescored = [j for j in (i - 1, i) if 0 <= j < len(scores) and rng.random() < 0.8]
+            if scores and rng.random() < 0.3:
+                rescored.append(rng.randrange(len(scores)))
+            for j in rescored:
+                scores[j] = new_score()
+                stumps.set_score(nodes[j], scores[j])
+
+        assert stumps.pop_best() is None
+        assert get_spans(stumps.get_constituents()) == [(0, n)]
+
+
+def test_stump_sequence_window():
+    """The window around a stump is the slice of the list around it."""
+    constituents = [Stump(i, i + 1) for i in range(6)]
+    stumps = StumpSequence(constituents)
+    nodes = stumps.get_nodes()
+    for i in range(len(constituents)):
+        for before in range(4):
+            for after in range(4):
+                (window, k) = stumps.get_window(nodes[i], before, after)
+                start = max(0, i - before)
+                assert [node.constituent for node in window] == constituents[start : i + after + 1]
+                assert k == i - start
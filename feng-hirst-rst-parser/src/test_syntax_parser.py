@@ -0,0 +1,81 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+"""
+Tests for the framing of the Stanford parser's output (prep/syntax_parser.py),
+which run against a fake ParserDemo instead of the JVM.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+from prep.syntax_parser import SyntaxParser, SyntaxParserPool
+
+
+# answers 'FAIL' with SKIPPED, and every other sentence with a flat parse
+FAKE_PARSER_DEMO = r'''#!%(python)s
+import sys
+sys.stderr.write('Loading parser from serialized file fake.ser.gz ... done\n')
+sys.stderr.flush()
+for line in iter(sys.stdin.readline, ''):
+    words = line.split()
+    if words == ['FAIL']:
+        sys.stdout.write(%(skipped)r)
+    else:
+        sys.stdout.write('(ROOT (S %%s))\n\n' %% ' '.join('(NN %%s)' %% w for w in words))
+        sys.stdout.write(''.join('dep(%%s-1, %%s-%%d)\n' %% (words[0], w, i + 1)
+                                 for (i, w) in enumerate(words)) + '\n')
+    sys.stdout.flush()
+'''
+
+
+def expected_parse(sentence):
+    words = sentence.split()
+    return ('(ROOT (S %s))' % ' '.join('(NN %s)' % w for w in words),
+            '\n'.join('dep(%s-1, %s-%d)' % (words[0], w, i + 1) for (i, w) in enumerate(words)))
+
+
+@pytest.fixture(params = ['SENTENCE_SKIPPED_OR_UNPARSABLE\n',
+                          'SENTENCE_SKIPPED_OR_UNPARSABLE\n\n\n'],
+                ids = ['skipped', 'skipped-with-empty-dependencies'])
+def fake_java(request, tmpdir, monkeypatch):
+    """Puts a `java` on the PATH that runs the fake ParserDemo."""
+    java = tmpdir.join('java')
+    java.write(FAKE_PARSER_DEMO % {'python': sys.executable, 'skipped': request.param})
+    os.chmod(str(java), stat.S_IRWXU)
+    monkeypatch.setenv('PATH', str(tmpdir) + os.pathsep + os.environ['PATH'])
+
+
+def test_syntax_parser_skipped_sentence(fake_java):
+    """The sentences after an unparsable one get their own parses."""
+    parser = SyntaxParser()
+    try:
+        with pytest.raises(Exception) as error:
+            parser.parse_sentences(['They liked it .', 'FAIL', 'They accepted the offer .'])
+        assert 'FAIL' in str(error.value)
+
+        assert parser.parse_sentences(['It rained .', 'We left .']) == \
+            [expected_parse('It rained .'), expected_parse('We left .')]
+        assert parser.parse_sentence('The end .') == expected_parse('The end .')
+        assert parser.stats()['sentences'] == 6
+    finally:
+        parser.unload()
+
+
+def test_syntax_parser_pool_stats(fake_java):
+    """The pool reports its queue and the sentences of each parser."""
+    pool = SyntaxParserPool(2)
+    try:
+        sentences = ['Sentence number %d .' % i for i in range(10)]
+        assert pool.parse_sentences(sentences) == [expected_parse(s) for s in sentences]
+
+        stats = pool.stats()
+        assert stats['queue_depth'] == 0
+        assert 1 <= stats['max_queue_depth'] <= 10
+        assert sum(parser['sentences'] for parser in stats['parsers']) == 10
+        assert all(0 <= parser['utilisation'] <= 1 for parser in stats['parsers'])
+    finally:
+        pool.unload()
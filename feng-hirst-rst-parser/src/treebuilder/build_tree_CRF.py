@@ -1,25 +1,117 @@
 
 from trees.parse_tree import ParseTree
 import paths
+import multiprocessing
+import sys
 
 from parsers.intra_sentential_parser import IntraSententialParser
 from parsers.multi_sentential_parser import MultiSententialParser
+from parsers.base_parser import TreeBuildingBudget
 from features.tree_feature_writer import CRFTreeFeatureWriter
 
 from classifiers.crf_classifier import CRFClassifier
 
+# the ways of building the document-level tree, see CRFTreeBuilder.build_tree
+DECODINGS = ['greedy', 'shift-reduce']
+
+# sentences of fewer EDUs are parsed by the tree builder itself, as they
+# take less time than sending the document to a sentence worker
+MIN_WORKER_SENTENCE_EDUS = 4
+
+# the intra-sentential parser of a sentence worker process, given to it
+# when its pool is started, see init_sentence_worker
+worker_intra_parser = None
+
+
+def init_sentence_worker(intra_parser):
+    global worker_intra_parser
+    worker_intra_parser = intra_parser
+
+
+def parse_sentences_worker(task):
+    """
+    Parses the sentences of the document with the given ids, with the given
+    budget (or None), in a sentence worker. Returns the labeled structure of
+    each sentence's tree, and the CRF calls spent on them and whether the
+    budget ran out.
+    """
+    (doc, sent_ids, budget) = task
+    worker_intra_parser.budget = budget
+    crf_calls = budget.crf_calls if budget is not None else 0
+    try:
+        merges = []
+        for sent_id in sent_ids:
+            sentence = doc.sentences[sent_id]
+            worker_intra_parser.parse_each_sentence(sentence)
+            merges.append(get_merges(sentence.constituents[0]))
+    finally:
+        worker_intra_parser.budget = None
+    
+    if budget is None:
+        return merges, 0, False
+    return merges, budget.crf_calls - crf_calls, budget.degraded
+
+
+def get_merges(c):
+    """
+    Returns the labeled structure of the tree of constituent c as nested
+    (label, left, right) tuples, with None for each EDU.
+    """
+    if c.left_child is None:
+        return None
+    
+    return (c.parse_subtree.label(), get_merges(c.left_child), get_merges(c.right_child))
+
+
+def replay_merges(merges, edus):
+    """
+    Merges the constituents of the EDUs (an iterator) like get_merges
+    describes, and returns the constituent of the whole tree.
+    """
+    if merges is None:
+        return edus.next()
+    
+    (label, left, right) = merges
+    L = replay_merges(left, edus)
+    R = replay_merges(right, edus)
+    return L.make_new_constituent(label, R)
+
+
 class CRFTreeBuilder:
-    def __init__(self, _name = "gCRF", verbose = False):
+    def __init__(self, _name = "gCRF", verbose = False, crf_backend = None, incremental = False,
+                 sentence_workers = 1, time_budget = None, crf_call_budget = None,
+                 shift_reduce_edus = None):
         self.name = _name
         self.verbose = verbose
+        self.crf_backend = crf_backend
         self.window_size = 3
+        self.sentence_workers = sentence_workers
+        # the pool of sentence workers, started when it's first needed
+        self.sentence_pool = None
         
-        self.intra_parser = IntraSententialParser(verbose = self.verbose, window_size = self.window_size)
+        # the seconds and the number of CRF sequences the tree of a document
+        # may take, see TreeBuildingBudget, and the number of documents whose
+        # tree building ran out of budget
+        self.time_budget = time_budget
+        self.crf_call_budget = crf_call_budget
+        self.num_docs = 0
+        self.budget_exhaustions = 0
+        
+        # the document-level tree of documents with more EDUs than this is
+        # built by shift-reduce decoding
+        self.shift_reduce_edus = shift_reduce_edus
+        
+        self.intra_parser = IntraSententialParser(verbose = self.verbose, window_size = self.window_size,
+                                                  incremental = incremental)
         self.multi_parser = MultiSententialParser(verbose = self.verbose, window_size = self.window_size)
         
         self.add_feature_writer()
         
         self.add_classifiers()
+        
+        if self.sentence_workers > 1:
+            # the sentence workers are forked from this process
+            self.share()
     
     
     def add_classifiers(self):
@@ -29,25 +121,29 @@ class CRFTreeBuilder:
                                         model_type = 'treebuilder',
                                         model_path = paths.TREE_BUILD_MODEL_PATH,
                                         model_file = 'struct/intra.crfsuite',
-                                        verbose = self.verbose)
+                                        verbose = self.verbose,
+                                        backend = self.crf_backend)
             
         bin_classifier2 = CRFClassifier(name= self.name + "_multi_bin",
                                         model_type = 'treebuilder',
                                         model_path = paths.TREE_BUILD_MODEL_PATH,
                                         model_file = 'struct/multi.crfsuite',
-                                        verbose = self.verbose)
+                                        verbose = self.verbose,
+                                        backend = self.crf_backend)
         
         mc_classifier1 = CRFClassifier(name= self.name + "_intra_mc",
                                        model_type = 'treebuilder',
                                        model_path = paths.TREE_BUILD_MODEL_PATH,
                                        model_file = 'label/intra.crfsuite',
-                                       verbose = self.verbose)
+                                       verbose = self.verbose,
+                                       backend = self.crf_backend)
         
         mc_classifier2 = CRFClassifier(name= self.name + "_multi_mc",
                                        model_type = 'treebuilder',
                                        model_path = paths.TREE_BUILD_MODEL_PATH,
                                        model_file = 'label/multi.crfsuite',
-                                       verbose = self.verbose)
+                                       verbose = self.verbose,
+                                       backend = self.crf_backend)
         
         self.add_classifier(bin_classifier1, 'bin1')
         self.add_classifier(mc_classifier1, 'mc1')
@@ -81,28 +177,153 @@ class CRFTreeBuilder:
         print 'Added feature writer to treebuilder'
         
         
-    def build_tree(self, doc):
+    def get_decoding(self, doc):
+        if self.shift_reduce_edus is not None and len(doc.edus) > self.shift_reduce_edus:
+            return 'shift-reduce'
+        
+        return 'greedy'
+    
+    
+    def build_tree(self, doc, decoding = None):
+        """
+        Builds the discourse tree of doc. The document-level tree is built
+        by greedy or shift-reduce decoding (see DECODINGS), or if decoding
+        is None, by the one for the document's number of EDUs.
+        """
+        if decoding is None:
+            decoding = self.get_decoding(doc)
+        elif decoding not in DECODINGS:
+            raise ValueError('Unknown decoding %s' % decoding)
+        
+        doc.decoding = decoding
+        
+        # a document without any text has no tree
+        if not doc.edus:
+            return None
+        
 #        print self.use_contextual_features 
         # Check if only one EDU
         if len(doc.edus) == 1:
-            return [ParseTree("n/a", [doc.edus[0]])]
+            doc.discourse_tree = ParseTree("n/a", [doc.edus[0]])
+            return doc.discourse_tree
         
-        for i in range(len(doc.sentences)):
-            sentence = doc.sentences[i]
-            (start_edu, end_edu) = doc.cuts[i]
-            
-            if self.verbose:
-                print 'sentence %d' % i
-                print 'start_edu', start_edu, 'end_edu', end_edu
-            
-            self.intra_parser.parse_each_sentence(sentence)
-
-        self.multi_parser.parse_document(doc)
+        budget = None
+        if self.time_budget is not None or self.crf_call_budget is not None:
+            budget = TreeBuildingBudget(self.time_budget, self.crf_call_budget)
+        
+        self.intra_parser.budget = budget
+        self.multi_parser.budget = budget
+        try:
+            if self.sentence_workers > 1:
+                self.parse_sentences_in_parallel(doc)
+            else:
+                for i in range(len(doc.sentences)):
+                    sentence = doc.sentences[i]
+                    (start_edu, end_edu) = doc.cuts[i]
+                    
+                    if self.verbose:
+                        print 'sentence %d' % i
+                        print 'start_edu', start_edu, 'end_edu', end_edu
+                    
+                    self.intra_parser.parse_each_sentence(sentence)
+    
+            self.multi_parser.parse_document(doc, shift_reduce = decoding == 'shift-reduce')
+        finally:
+            self.intra_parser.budget = None
+            self.multi_parser.budget = None
+        
+        self.num_docs += 1
+        doc.degraded = budget is not None and budget.degraded
+        doc.crf_calls = budget.crf_calls if budget is not None else None
+        if doc.degraded:
+            self.budget_exhaustions += 1
     
         return doc.discourse_tree
+    
+    
+    def parse_sentences_in_parallel(self, doc):
+        """
+        Builds the trees of the sentences of doc of at least
+        MIN_WORKER_SENTENCE_EDUS EDUs in the pool of sentence_workers
+        processes, while the other sentences are parsed here. The pool is
+        forked from this process when it's first needed, and each worker
+        parses with its copy of the intra-sentential parser. The sentences
+        are split into one task per worker, each with a copy of doc, and
+        the labeled structure of each tree is rebuilt from the sentence's
+        EDUs here.
+        
+        Daemonic processes, e.g. the workers of parse.py -w, can't fork, so
+        they parse the sentences one after the other.
+        
+        With a budget, each task checks its own copy of it, so together
+        they can make more CRF calls than the budget allows before they
+        notice; their calls are charged to the budget here.
+        """
+        sent_ids = [i for (i, (start_edu, end_edu)) in enumerate(doc.cuts)
+                    if end_edu - start_edu >= MIN_WORKER_SENTENCE_EDUS]
+        num_tasks = min(self.sentence_workers, len(sent_ids))
+        
+        if num_tasks < 2 or multiprocessing.current_process().daemon:
+            for sentence in doc.sentences:
+                self.intra_parser.parse_each_sentence(sentence)
+            return
+        
+        if self.sentence_pool is None:
+            # or the workers could write the buffered output once more
+            sys.stdout.flush()
+            self.sentence_pool = multiprocessing.Pool(self.sentence_workers,
+                                                      initializer = init_sentence_worker,
+                                                      initargs = (self.intra_parser, ))
+        
+        # the longest sentences first, dealt out to the tasks in turn, so
+        # that each task gets about as many long sentences
+        sent_ids.sort(key = lambda i: doc.cuts[i][0] - doc.cuts[i][1])
+        task_sent_ids = [sent_ids[k : : num_tasks] for k in range(num_tasks)]
+        budget = self.intra_parser.budget
+        results = self.sentence_pool.map_async(parse_sentences_worker,
+                                               [(doc, ids, budget) for ids in task_sent_ids],
+                                               chunksize = 1)
+        
+        # the short sentences are parsed while the workers parse the long ones
+        for sentence in doc.sentences:
+            if sentence.sent_id not in sent_ids:
+                self.intra_parser.parse_each_sentence(sentence)
+        
+        merges = {}
+        for (ids, (task_merges, crf_calls, degraded)) in zip(task_sent_ids, results.get()):
+            merges.update(zip(ids, task_merges))
+            if budget is not None:
+                budget.charge(crf_calls)
+                budget.degraded |= degraded
+        
+        for sentence in doc.sentences:
+            if sentence.sent_id in merges:
+                sentence.prepare_parsing()
+                c = replay_merges(merges[sentence.sent_id], iter(sentence.constituents))
+                sentence.constituents = [c]
+                sentence.discourse_tree = c.parse_subtree
 
     
+    def share(self):
+        for classifier in self.classifiers:
+            classifier.share()
+    
+    
+    def stats(self):
+        """
+        Returns the number of documents of more than one EDU whose trees
+        have been built, and the number of those whose tree building ran
+        out of budget, i.e. whose trees are degraded.
+        """
+        return {'documents': self.num_docs,
+                'budget_exhaustions': self.budget_exhaustions}
+
     def unload(self):
+        if self.sentence_pool is not None:
+            self.sentence_pool.close()
+            self.sentence_pool.join()
+            self.sentence_pool = None
+        
         self.intra_parser.unload()
         self.multi_parser.unload()
         
@@ -9,6 +9,10 @@ class LexicalizedTree(ParseTree):
     head = -1
     head_sup = -1
     
+    # the leaves of the tree and their tree positions, see index_leaves
+    leaf_array = None
+    leaf_positions = None
+    
     def unescape(self, mystr):
         #return replace_words(mystr.lower(), self.penn_special_chars)
         return unescape_penn_special_word(mystr)
@@ -21,6 +25,42 @@ class LexicalizedTree(ParseTree):
         
         return unescaped_leaves
     
+    def _get_leaf_positions(self):
+        """Returns the leaves of the tree and their tree positions, in a single walk."""
+        leaves = []
+        positions = []
+        
+        stack = [((), self)]
+        while stack:
+            (pos, node) = stack.pop()
+            if isinstance(node, Tree):
+                for i in range(len(node) - 1, -1, -1):
+                    stack.append((pos + (i, ), node[i]))
+            else:
+                leaves.append(node)
+                positions.append(pos)
+        
+        return leaves, positions
+    
+    def index_leaves(self):
+        """
+        Builds the leaf array and the leaf position table of the tree, so that
+        the heads can be looked up without walking the tree. The index is
+        built after lexicalization; it's dropped when null elements are
+        removed, and has to be rebuilt if the tree is changed otherwise.
+        """
+        (self.leaf_array, self.leaf_positions) = self._get_leaf_positions()
+    
+    def get_leaves(self):
+        if self.leaf_array is None:
+            return self.leaves()
+        return self.leaf_array
+    
+    def get_leaf_treeposition(self, index):
+        if self.leaf_positions is None:
+            return self.leaf_treeposition(index)
+        return self.leaf_positions[index]
+    
     def get_head(self, pos):
         if not isinstance(self[pos], LexicalizedTree):
             return self.get_head(pos[:-1])
@@ -28,7 +68,7 @@ class LexicalizedTree(ParseTree):
             raise IndexError("No head present")
         
         
-        return self.leaves()[self[pos].head].lower()
+        return self.get_leaves()[self[pos].head].lower()
     
     def get_head_tag(self, pos):
         if not isinstance(self[pos], LexicalizedTree):
@@ -37,8 +77,8 @@ class LexicalizedTree(ParseTree):
             raise IndexError("No head present")
         
         
-        leaf_pos = self.leaf_treeposition(self[pos].head)
-        return self.leaves()[self[pos].head].lower(), self.get_syntactic_tag(leaf_pos)
+        leaf_pos = self.get_leaf_treeposition(self[pos].head)
+        return self.get_leaves()[self[pos].head].lower(), self.get_syntactic_tag(leaf_pos)
 
     def get_syntactic_tag(self, pos):
         if not isinstance(self[pos], LexicalizedTree):
@@ -48,12 +88,16 @@ class LexicalizedTree(ParseTree):
     def remove_null_elements(self):
         to_delete = []
         
-        for i in range(0, len(self.leaves())):
-            pos = self.leaf_treeposition(i)[0:-1]
+        for leaf_pos in self._get_leaf_positions()[1]:
+            pos = leaf_pos[0:-1]
             #print 'pos', pos, self[pos]
             if self[pos].label() == '-NONE-':
                 to_delete += [pos]
         
+        if to_delete:
+            self.leaf_array = None
+            self.leaf_positions = None
+        
         for pos in reversed(to_delete):
             del self[pos]
             while len(self[pos[0:-1]]) == 0:
@@ -74,9 +118,9 @@ class LexicalizedTree(ParseTree):
         #print heads
         self.remove_null_elements()
         
-        for i in range(0, len(self.leaves())):
+        for (i, leaf_pos) in enumerate(self._get_leaf_positions()[1]):
             #print 'leaf:', self.leaves()[i]
-            pos = self.leaf_treeposition(i)[0:-1]
+            pos = leaf_pos[0:-1]
             sub = self[pos]
             
             while len(heads[offset]) < 2:
@@ -98,6 +142,7 @@ class LexicalizedTree(ParseTree):
             #print
         
         self._lexicalize()
+        self.index_leaves()
         return offset
     
     def _lexicalize(self):
@@ -154,10 +199,11 @@ class LexicalizedTree(ParseTree):
 
         # Add lexical head info:
         if self.head >= 0:
-            if self.head >= len(self.root.leaves()):
+            root_leaves = self.root().get_leaves()
+            if self.head >= len(root_leaves):
                 print self.head
-                print self.root.leaves()
-            head_str = '[' + self.root.leaves()[self.head] + ' ' + str(self.head) + ' ' + str(self.head_sup) + '] '
+                print root_leaves
+            head_str = '[' + root_leaves[self.head] + ' ' + str(self.head) + ' ' + str(self.head_sup) + '] '
         else:
             head_str = ''
 
@@ -178,10 +224,11 @@ class LexicalizedTree(ParseTree):
 
         # Add lexical head info:
         if self.head >= 0:
-            if self.head >= len(self.root.leaves()):
+            root_leaves = self.root().get_leaves()
+            if self.head >= len(root_leaves):
                 print self.head
-                print self.root.leaves()
-            head_str = '[' + self.root.leaves()[self.head] + '] '
+                print root_leaves
+            head_str = '[' + root_leaves[self.head] + '] '
         else:
             head_str = '' + str(self.head)
             
@@ -1,4 +1,6 @@
 import re
+import bisect
+import sys
 from itertools import izip
 from nltk.tree import Tree
 from trees.parse_tree import ParseTree
@@ -15,13 +17,14 @@ def replace_words(text, word_dic):
         return word_dic[match.group(0)]
     return rc.sub(translate, text)
 
-def unescape_penn_special_word(text):
-    penn_special_chars = {'-LRB-': '(', '-RRB-': ')', '-LAB-': '<', '-RAB-': '>',
-                            '-LCB-': '{', '-RCB-': '}', '-LSB-': '[', '-RSB-':']',
-                          '\\/' : '/', '\\*' : '*',
-                          '``' : '"', "''" : '"', '`' : "'"}
+PENN_SPECIAL_CHARS = {'-LRB-': '(', '-RRB-': ')', '-LAB-': '<', '-RAB-': '>',
+                        '-LCB-': '{', '-RCB-': '}', '-LSB-': '[', '-RSB-':']',
+                      '\\/' : '/', '\\*' : '*',
+                      '``' : '"', "''" : '"', '`' : "'"}
+PENN_SPECIAL_CHARS_RE = re.compile('|'.join(map(re.escape, PENN_SPECIAL_CHARS)))
 
-    return replace_words(text, penn_special_chars)
+def unescape_penn_special_word(text):
+    return PENN_SPECIAL_CHARS_RE.sub(lambda match: PENN_SPECIAL_CHARS[match.group(0)], text)
 
 
 def sorted_dict_values_by_key(adict):
@@ -220,9 +223,13 @@ def make_new_subtree(label, subtree1, subtree2, deepcopy = False):
 
 
 def find_EDU_in_sentence_index(cuts, edu_index):
-    for (i, (sent_start_edu, sent_end_edu)) in enumerate(cuts):
-        if edu_index >= sent_start_edu and edu_index < sent_end_edu:
-            return i
+    # the last sentence that starts at or before the EDU
+    i = bisect.bisect_right(cuts, (edu_index, sys.maxint)) - 1
+    while i >= 0 and cuts[i][0] == cuts[i][1]:
+        # an empty sentence
+        i -= 1
+    if i >= 0 and edu_index < cuts[i][1]:
+        return i
 
 
 def load_tree_from_file(filename, tokenize = False):
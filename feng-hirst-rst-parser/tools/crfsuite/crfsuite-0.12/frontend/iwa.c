@@ -33,6 +33,7 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <unistd.h>
 
 #include "iwa.h"
 
@@ -130,7 +131,15 @@ static int peek_char(iwa_t* iwa)
 {
     /* Refill the buffer if necessary. */
     if (iwa->end <= iwa->offset) {
-        size_t count = fread(iwa->buffer, sizeof(char), BUFFER_SIZE, iwa->fp);
+        /*
+         * Use read(2) rather than fread(3): fread blocks until the whole
+         * buffer is filled, which never happens when a client keeps a pipe
+         * open and waits for the result of the sequence it has just sent.
+         */
+        ssize_t count = read(fileno(iwa->fp), iwa->buffer, BUFFER_SIZE);
+        if (count < 0) {
+            count = 0;
+        }
         iwa->offset = iwa->buffer;
         iwa->end = iwa->buffer + count;
         if (count == 0) {
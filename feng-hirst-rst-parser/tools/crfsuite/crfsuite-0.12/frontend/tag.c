@@ -185,6 +185,8 @@ output_result(
         fprintf(fpo, "\n");
     }
     fprintf(fpo, "\n");
+    /* Clients may keep the process alive and wait for each result block. */
+    fflush(fpo);
 }
 
 static void
@@ -213,6 +215,8 @@ output_instance(
         fprintf(fpo, "\n");
     }
     fprintf(fpo, "\n");
+    /* Clients may keep the process alive and wait for each result block. */
+    fflush(fpo);
 }
 
 static int message_callback(void *instance, const char *format, va_list args)
@@ -13940,7 +13940,7 @@ static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFS
 static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__allocator_type[] = {  {&_swigt__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__allocator_type, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__difference_type[] = {  {&_swigt__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__difference_type, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__size_type[] = {  {&_swigt__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__size_type, 0, 0, 0},{0, 0, 0, 0}};
-static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__value_type[] = {  {&_swigt__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__value_type, 0, 0, 0},{0, 0, 0, 0}};
+static swig_cast_info _swigc__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__value_type[] = {  {&_swigt__p_std__vectorT_CRFSuite__Item_std__allocatorT_CRFSuite__Item_t_t__value_type, 0, 0, 0},  {&_swigt__p_std__vectorT_CRFSuite__Attribute_std__allocatorT_CRFSuite__Attribute_t_t, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__vectorT__Tp__Alloc_t[] = {  {&_swigt__p_std__vectorT__Tp__Alloc_t, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__vectorT_std__string_std__allocatorT_std__string_t_t[] = {  {&_swigt__p_std__vectorT_std__string_std__allocatorT_std__string_t_t, 0, 0, 0},{0, 0, 0, 0}};
 static swig_cast_info _swigc__p_std__vectorT_std__vectorT_CRFSuite__Attribute_std__allocatorT_CRFSuite__Attribute_t_t_std__allocatorT_std__vectorT_CRFSuite__Attribute_std__allocatorT_CRFSuite__Attribute_t_t_t_t[] = {  {&_swigt__p_std__vectorT_std__vectorT_CRFSuite__Attribute_std__allocatorT_CRFSuite__Attribute_t_t_std__allocatorT_std__vectorT_CRFSuite__Attribute_std__allocatorT_CRFSuite__Attribute_t_t_t_t, 0, 0, 0},{0, 0, 0, 0}};